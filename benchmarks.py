@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Rough benchmarks for sc2bnet. None of these talk to Battle.net; network benchmarks run
+against a local stand-in server instead.
+
+Run all benchmarks with ``python benchmarks.py`` or a single one by name, e.g.
+``python benchmarks.py transport``.
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+import requests
+import sc2bnet
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_server():
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:{0}/api/sc2/data/rewards'.format(server.server_address[1])
+
+
+def requests_per_second(get, url, count):
+    start = time.time()
+    for i in range(count):
+        get(url).json()
+    return count / (time.time() - start)
+
+
+def bench_transport(count=500):
+    """Compare module level requests.get against a pooled SessionTransport."""
+    server, url = start_server()
+    try:
+        baseline = requests_per_second(requests.get, url, count)
+        transport = sc2bnet.SessionTransport()
+        pooled = requests_per_second(transport.get, url, count)
+        transport.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("transport: requests.get       {0:8.1f} req/s".format(baseline))
+    print("transport: SessionTransport   {0:8.1f} req/s ({1:.2f}x)".format(pooled, pooled / baseline))
+
+
+def ladder_payload(ladder_id):
+    return dict(ladderMembers=[dict(
+        character=dict(
+            id=ladder_id * 100 + i, realm=1, displayName='Player{0}'.format(i), clanName='Clan {0}'.format(i % 7),
+            clanTag='CLN{0}'.format(i % 7), profilePath='/profile/{0}/1/Player{1}/'.format(ladder_id * 100 + i, i),
+        ),
+        joinTimestamp=1375000000 + i, points=2000 - i * 7, wins=100 + i, losses=90 - i // 2,
+        highestRank=i + 1, previousRank=i + 2, favoriteRaceP1=('ZERG', 'TERRAN', 'PROTOSS')[i % 3],
+    ) for i in range(100)])
+
+
+def folder_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files)
+
+
+def bench_compression(count=200):
+    """Disk usage and read latency of FileCache ladder entries for each compression codec."""
+    keys = [('us.battle.net', 'en_US', '/api/sc2/ladder/{0}'.format(i)) for i in range(count)]
+    for compression in [None] + sorted(sc2bnet.COMPRESSION):
+        path = tempfile.mkdtemp()
+        try:
+            cache = sc2bnet.FileCache(path, cache_types=['ladder'], compression=compression)
+            start = time.time()
+            for i, key in enumerate(keys):
+                cache[key] = ladder_payload(i)
+            write = (time.time() - start) / count
+            start = time.time()
+            for key in keys:
+                cache[key]
+            read = (time.time() - start) / count
+            size = folder_size(path) / count
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+        print("compression: {0:6} {1:8.0f} bytes/entry  write {2:6.3f} ms  read {3:6.3f} ms".format(
+            compression or 'none', size, write * 1000, read * 1000))
+
+
+class LegacyLadderRanking(object):
+    """The v1.0.0 LadderRanking layout, which built a full PlayerProfile for every member."""
+    def __init__(self, data, ladder, factory):
+        self.region = ladder.region
+        self.ladder = ladder
+        item = data['character']
+        character = sc2bnet.PlayerProfile(self.region, item['id'], item['realm'], item['displayName'], factory)
+        character.clan_name = item['clanName']
+        character.clan_tag = item['clanTag']
+        self.players = [character]
+        self.rank = None
+        self.previous_rank = data['previousRank']
+        self.highest_rank = data['highestRank']
+        self.wins = data['wins']
+        self.losses = data['losses']
+        self.points = data['points']
+        self.join_time = sc2bnet.datetime.fromtimestamp(data['joinTimestamp'])
+        self.favorite_races = list()
+        for pid in range(1, 9):
+            key = "favoriteRaceP{0}".format(pid)
+            if key in data:
+                self.favorite_races.append(data[key])
+
+
+def allocated(build):
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def bench_memory(count=200):
+    """Memory held by the rankings of a region's worth of ladders."""
+    factory = sc2bnet.SC2BnetFactory()
+    payloads = [ladder_payload(i) for i in range(count)]
+    ladder = sc2bnet.Ladder('us', 1, factory)
+    for cls in [LegacyLadderRanking, sc2bnet.LadderRanking]:
+        size, rankings = allocated(lambda: [[cls(item, ladder, factory) for item in payload['ladderMembers']]
+                                            for payload in payloads])
+        print("memory: {0:20} {1:8.0f} bytes/ranking".format(cls.__name__, size / (count * 100)))
+
+
+#: Modules that importing sc2bnet must not import, since they are slow and rarely used
+DEFERRED_MODULES = ['asyncio', 'sqlite3']
+
+
+def bench_import(count=10):
+    """
+    Wall time of a fresh interpreter importing sc2bnet, against one importing only requests.
+    Fails when the import builds the default factory or imports any of the DEFERRED_MODULES.
+    """
+    env = dict(os.environ, SC2BNET_CACHE_DIR=tempfile.mkdtemp())
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    check = "import sys, sc2bnet; assert sc2bnet._factory is None; assert not set({0!r}) & set(sys.modules)"
+    try:
+        subprocess.check_call([sys.executable, '-c', check.format(DEFERRED_MODULES)], env=env, cwd=cwd)
+        for module in ['requests', 'sc2bnet']:
+            start = time.time()
+            for i in range(count):
+                subprocess.check_call([sys.executable, '-c', 'import ' + module], env=env, cwd=cwd)
+            print("import: {0:8} {1:8.1f} ms".format(module, (time.time() - start) / count * 1000))
+    finally:
+        shutil.rmtree(env['SC2BNET_CACHE_DIR'], ignore_errors=True)
+
+
+def icon_data(i):
+    return dict(x=i % 10 * 75, y=i // 10 * 75, w=75, h=75, offset=i % 60, url='http://media/{0}.jpg'.format(i // 60))
+
+
+class CatalogTransport(object):
+    """
+    Serves a catalog about the size of the real one; 2000 achievements and 500 rewards.
+    Titles and descriptions are translated into the requested locale.
+    """
+    def get(self, url, headers=None, timeout=None):
+        locale = url.split('locale=')[1]
+        path = sc2bnet.urlparse(url).path
+        if path == '/api/sc2/data/achievements':
+            return FakeResponse(dict(
+                achievements=[dict(
+                    title='Achievement {0} {1}'.format(i, locale), description='Do thing {0} {1}'.format(i, locale),
+                    achievementId=i, categoryId=i % 50, points=10, icon=icon_data(i),
+                ) for i in range(1, 2001)],
+                categories=[dict(
+                    categoryId=c * 10, featuredAchievementId=c, title='Category {0} {1}'.format(c, locale),
+                    children=[dict(categoryId=c * 10 + s, featuredAchievementId=0, title='Sub {0} {1}'.format(s, locale))
+                              for s in range(1, 10)],
+                ) for c in range(5)],
+            ))
+        else:
+            return FakeResponse(dict(portraits=[dict(
+                title='Portrait {0} {1}'.format(i, locale), id=i, achievementId=i, icon=icon_data(i),
+            ) for i in range(1, 501)]))
+
+
+class FakeResponse(object):
+    status_code = 200
+    headers = dict()
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+def bench_catalog(count=20):
+    """Time to get linked catalogs in a new factory, from payloads in a FileCache and from a CatalogIndex."""
+    path = tempfile.mkdtemp()
+    try:
+        transport = CatalogTransport()
+        cache = sc2bnet.FileCache(path, cache_types=['data'])
+        index = sc2bnet.CatalogIndex(path)
+        for name, options in [('payloads', dict()), ('index', dict(catalog_index=index))]:
+            sc2bnet.SC2BnetFactory(transport=transport, cache=cache, **options).icon
+            start = time.time()
+            for i in range(count):
+                sc2bnet.SC2BnetFactory(transport=transport, cache=cache, **options).icon
+            print("catalog: {0:10} {1:8.2f} ms".format(name, (time.time() - start) / count * 1000))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def bench_locales():
+    """Memory held by each locale's catalogs once the first locale is loaded."""
+    factory = sc2bnet.SC2BnetFactory(transport=CatalogTransport())
+    factory.get_icons('en_US')
+    size, catalogs = allocated(lambda: factory.get_icons('fr_FR'))
+    print("locales: second locale {0:10.0f} bytes".format(size))
+
+
+BENCHMARKS = dict(
+    catalog=bench_catalog,
+    compression=bench_compression,
+    import_time=bench_import,
+    locales=bench_locales,
+    memory=bench_memory,
+    transport=bench_transport,
+)
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or sorted(BENCHMARKS):
+        BENCHMARKS[name]()
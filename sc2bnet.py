@@ -1,15 +1,45 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals, division
 
+import array
 import base64
+import bz2
+import collections
+from concurrent import futures
 from datetime import datetime
+import errno
+import gc
+import gzip
 import hashlib
+import heapq
 import hmac
+import io
 import itertools
 import json
 import os
+import pickle
+import random
 import requests
 import sys
+import tempfile
+import threading
+import time
+import weakref
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
 
 HOST_BY_REGION = dict(
@@ -47,6 +77,43 @@ DEFAULT_LOCALE_BY_HOST = {
     'eu.battle.net':'en_GB',
 }
 
+#: The version of the entries :meth:`SC2BnetFactory.load_data` writes to caches. Entries
+#: wrap the response data with the time it was fetched and its ETag and Last-Modified
+#: validators, or the json of the :class:`SC2BnetError` the request failed with.
+CACHE_ENTRY_VERSION = 1
+
+
+def _gzip_compress(data, level):
+    # gzip.compress and gzip.decompress are only available on python 3.2+, and GzipFile
+    # can't be used in a with statement before python 2.7
+    buffer = io.BytesIO()
+    gzip_file = gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=level)
+    try:
+        gzip_file.write(data)
+    finally:
+        gzip_file.close()
+    return buffer.getvalue()
+
+
+def _gzip_decompress(data):
+    gzip_file = gzip.GzipFile(fileobj=io.BytesIO(data), mode='rb')
+    try:
+        return gzip_file.read()
+    finally:
+        gzip_file.close()
+
+
+#: The codecs available to :class:`FileCache` compression: name -> (file suffix, compress, decompress)
+COMPRESSION = dict(
+    gzip=('.gz', _gzip_compress, _gzip_decompress),
+    bz2=('.bz2', lambda data, level: bz2.compress(data, level), bz2.decompress),
+)
+if lzma is not None:
+    COMPRESSION['lzma'] = ('.xz', lambda data, level: lzma.compress(data, preset=level), lzma.decompress)
+
+#: The default ``(connect, read)`` timeouts in seconds for Web API requests
+DEFAULT_TIMEOUT = (10, 60)
+
 LADDER_TYPES = dict(
     # FFA is unranked!
     HOTS_SOLO=("HotS", '1v1'),
@@ -60,6 +127,28 @@ LADDER_TYPES = dict(
 )
 
 
+# Used for measuring intervals; time.time can jump when the system clock changes
+_clock = getattr(time, 'monotonic', time.time)
+
+#: The outcome of loading one key with :meth:`SC2BnetFactory.load_many`. Exactly one of
+#: ``value`` and ``error`` is set.
+LoadResult = collections.namedtuple('LoadResult', ['key', 'value', 'error'])
+
+#: The difference between two loads of a ladder from :func:`diff_rankings`. ``added`` and
+#: ``removed`` are lists of :class:`LadderRanking` and ``changed`` is a list of
+#: ``(old, new)`` ranking pairs.
+LadderDiff = collections.namedtuple('LadderDiff', ['added', 'removed', 'changed'])
+
+#: A saved ranking from a :meth:`Ladder.snapshot`, as used by :func:`diff_rankings` in place
+#: of a :class:`LadderRanking` that is no longer loaded.
+RankingSnapshot = collections.namedtuple('RankingSnapshot', ['key', 'rank', 'points', 'wins', 'losses'])
+
+#: The outcome of :meth:`SC2BnetFactory.load_regions`. ``results`` is a dict of region ->
+#: loaded value and ``errors`` is a dict of region -> exception for regions that failed or
+#: ran out of time.
+RegionResults = collections.namedtuple('RegionResults', ['results', 'errors'])
+
+
 class SC2BnetError(Exception):
     """Thrown when there are errors in the Web API response."""
     def __init__(self, data):
@@ -74,6 +163,110 @@ class SC2BnetError(Exception):
         self.message = data['message']
 
 
+class RateLimitExceeded(Exception):
+    """Thrown by a non-blocking :class:`RateLimiter` when a request would exceed a limit."""
+    def __init__(self, scope, wait):
+        super(Exception, self).__init__("Rate limit exceeded for {0}, retry in {1:.2f}s".format(scope, wait))
+        #: The host or public key whose limit would be exceeded
+        self.scope = scope
+
+        #: The number of seconds until the request would be allowed
+        self.wait = wait
+
+
+class RateLimiter(object):
+    """
+    :param per_second: The default number of requests allowed per second for each public key.
+    :param per_hour: The default number of requests allowed per hour for each public key.
+    :param limits: A dict of host or public key -> ``(per_second, per_hour)`` to use instead of
+        the defaults. Hosts are only limited when they are listed here.
+    :param block: When True, :meth:`acquire` waits for capacity. Otherwise it raises
+        :class:`RateLimitExceeded` straight away.
+
+    A thread-safe token bucket limiter for :meth:`SC2BnetFactory.load_data`. Share one
+    instance between factories and threads to keep a whole crawl under quota. Either limit
+    may be None to leave it unbounded.
+    """
+    def __init__(self, per_second=None, per_hour=None, limits=None, block=True):
+        self.per_second = per_second
+        self.per_hour = per_hour
+        self.limits = limits or dict()
+        self.block = block
+        self._buckets = dict()
+        self._history = dict()
+        self._totals = dict()
+        self._lock = threading.Lock()
+
+    def acquire(self, host, public_key=None):
+        """Take one request from the budgets for the host and public key."""
+        scopes = [public_key]
+        if host in self.limits:
+            scopes.append(host)
+
+        while True:
+            with self._lock:
+                now = _clock()
+                buckets = [(scope, bucket) for scope in scopes for bucket in self._get_buckets(scope, now)]
+                waits = [(bucket.wait(now), scope) for scope, bucket in buckets]
+                wait, scope = max(waits + [(0, None)], key=lambda item: item[0])
+                if wait <= 0:
+                    for scope, bucket in buckets:
+                        bucket.take(now)
+                    for scope in (public_key, host):
+                        self._record(scope, now)
+                    return
+
+            if not self.block:
+                raise RateLimitExceeded(scope, wait)
+            time.sleep(wait)
+
+    def counts(self, scope):
+        """
+        Returns a dict with the number of requests made for a host or public key in the last
+        ``second``, the last ``hour``, and in ``total``.
+        """
+        with self._lock:
+            now = _clock()
+            history = self._history.get(scope, ())
+            return dict(
+                second=sum(1 for stamp in history if now - stamp < 1),
+                hour=sum(1 for stamp in history if now - stamp < 3600),
+                total=self._totals.get(scope, 0),
+            )
+
+    def _get_buckets(self, scope, now):
+        if scope not in self._buckets:
+            per_second, per_hour = self.limits.get(scope, (self.per_second, self.per_hour))
+            self._buckets[scope] = [
+                _TokenBucket(rate, period, now) for rate, period in ((per_second, 1), (per_hour, 3600)) if rate
+            ]
+        return self._buckets[scope]
+
+    def _record(self, scope, now):
+        history = self._history.setdefault(scope, collections.deque())
+        history.append(now)
+        while history and now - history[0] >= 3600:
+            history.popleft()
+        self._totals[scope] = self._totals.get(scope, 0) + 1
+
+
+class _TokenBucket(object):
+    def __init__(self, rate, period, now):
+        # A bucket must hold at least one whole token or no request could ever be taken
+        self.capacity = max(rate, 1)
+        self.tokens = self.capacity
+        self.fill_rate = rate / period
+        self.updated = now
+
+    def wait(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.fill_rate
+
+    def take(self, now):
+        self.tokens -= 1
+
+
 class NoCache(object):
     def __getitem__(self, key):
         raise KeyError(key)
@@ -86,150 +279,974 @@ class NoCache(object):
 
 
 class FileCache(object):
-    def __init__(self, cache_path, cache_types=None):
+    """
+    :param cache_path: The path to a pre-existing writable folder to cache responses in.
+    :param cache_types: The data types to cache. Defaults to just ``data``.
+    :param compression: One of the :data:`COMPRESSION` codecs to compress new entries with.
+        Entries are read back in whatever format they were written in.
+    :param compression_level: The compression level passed to the codec.
+    """
+    def __init__(self, cache_path, cache_types=None, compression=None, compression_level=6):
         self.cache_types = cache_types or ['data']
         self.cache_path = os.path.abspath(cache_path)
         if not os.path.exists(self.cache_path):
             raise ValueError("Cache path does not exist: "+self.cache_path)
+        if compression is not None and compression not in COMPRESSION:
+            raise ValueError("Unknown compression: {0}".format(compression))
+        self.compression = compression
+        self.compression_level = compression_level
+
+        # Look for entries in the configured format first
+        formats = [compression] + [None] + sorted(COMPRESSION)
+        self._formats = [f for i, f in enumerate(formats) if f not in formats[:i]]
 
     def __getitem__(self, key):
         data_type, path = self._get_info(key)
-        if data_type in self.cache_types and os.path.exists(path):
-            with open(path, 'r') as data_file:
-                return json.load(data_file)
-        else:
-            raise KeyError(key)
+        if data_type in self.cache_types:
+            for compression in self._formats:
+                file_path = self._path(path, compression)
+                try:
+                    with open(file_path, 'rb') as data_file:
+                        contents = data_file.read()
+                except IOError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    continue
+
+                try:
+                    if compression is not None:
+                        contents = COMPRESSION[compression][2](contents)
+                    return json.loads(contents.decode('utf8'))
+                except Exception:
+                    # Corrupt entries are evicted and treated as misses
+                    self._remove(file_path)
+                    break
+        raise KeyError(key)
 
     def __setitem__(self, key, value):
         data_type, path = self._get_info(key)
         if data_type in self.cache_types:
-            if not os.path.exists(os.path.dirname(path)):
-                os.makedirs(os.path.dirname(path))
-            with open(path, 'w') as data_file:
-                json.dump(value, data_file)
+            contents = json.dumps(value).encode('utf8')
+            if self.compression is not None:
+                contents = COMPRESSION[self.compression][1](contents, self.compression_level)
+
+            # Other processes may be creating the same folder
+            directory = os.path.dirname(path)
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            _atomic_write(self._path(path, self.compression), contents)
+
+            # Copies in other formats are out of date now
+            for compression in self._formats:
+                if compression != self.compression:
+                    self._remove(self._path(path, compression))
 
     def __contains__(self, key):
         data_type, path = self._get_info(key)
         if data_type in self.cache_types:
-            return os.path.exists(path)
+            return any(os.path.exists(self._path(path, compression)) for compression in self._formats)
         else:
             return False
 
+    def _path(self, path, compression):
+        return path + COMPRESSION[compression][0] if compression else path
+
+    def _remove(self, file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
     def _get_info(self, key):
         host, locale, path = key
-        parts = path[9:].strip("/").split("/")
-        data_type = parts[0]
-        data_key = '_'.join(parts[1:])
+        data_type, data_key = _parse_path(path)
         cache_key = "{0}/{1}/{2}/{3}.json".format(host, locale, data_type, data_key)
         return data_type, os.path.join(self.cache_path, cache_key)
 
 
+class SQLiteCache(object):
+    """
+    :param db_path: The path to the database file. It is created if it doesn't exist yet but
+        the folder it lives in must already exist.
+    :param cache_types: The data types to cache, like :class:`FileCache`.
+
+    Keeps every entry in a single SQLite database running in WAL mode so that readers in
+    other processes aren't blocked by writers. Entries are indexed by ``(host, locale, path)``.
+    Each thread reads through a connection of its own, so only writes wait on each other.
+    """
+    def __init__(self, db_path, cache_types=None):
+        self.cache_types = cache_types or ['data']
+        self.db_path = os.path.abspath(db_path)
+        if not os.path.exists(os.path.dirname(self.db_path)):
+            raise ValueError("Cache path does not exist: "+os.path.dirname(self.db_path))
+
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = list()
+        self._connections_lock = threading.Lock()
+        db = self._connect()
+        with self._write_lock:
+            with db:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "  host TEXT NOT NULL, locale TEXT NOT NULL, path TEXT NOT NULL,"
+                    "  data_type TEXT NOT NULL, stored REAL NOT NULL, value TEXT NOT NULL,"
+                    "  PRIMARY KEY (host, locale, path)"
+                    ") WITHOUT ROWID"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS entries_by_age ON entries (data_type, stored)")
+
+    def __getitem__(self, key):
+        if _parse_path(key[2])[0] in self.cache_types:
+            row = self._connect().execute(
+                "SELECT value FROM entries WHERE host=? AND locale=? AND path=?", key
+            ).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self.update([(key, value)])
+
+    def __contains__(self, key):
+        if _parse_path(key[2])[0] not in self.cache_types:
+            return False
+        row = self._connect().execute(
+            "SELECT 1 FROM entries WHERE host=? AND locale=? AND path=?", key
+        ).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def update(self, items):
+        """Store an iterable of ``(key, value)`` pairs, or a dict, in a single transaction."""
+        if isinstance(items, dict):
+            items = items.items()
+        now = time.time()
+        rows = list()
+        for (host, locale, path), value in items:
+            data_type = _parse_path(path)[0]
+            if data_type in self.cache_types:
+                rows.append((host, locale, path, data_type, now, json.dumps(value)))
+        db = self._connect()
+        with self._write_lock:
+            with db:
+                db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def sweep(self, max_age, data_types=None):
+        """
+        Delete entries stored more than ``max_age`` seconds ago, optionally only for the
+        given data types. Returns the number of entries deleted.
+        """
+        query = "DELETE FROM entries WHERE stored < ?"
+        params = [time.time() - max_age]
+        if data_types is not None:
+            query += " AND data_type IN ({0})".format(",".join("?" * len(data_types)))
+            params.extend(data_types)
+        db = self._connect()
+        with self._write_lock:
+            with db:
+                return db.execute(query, params).rowcount
+
+    def close(self):
+        """Close the connections of every thread."""
+        with self._connections_lock:
+            for thread, db in self._connections:
+                db.close()
+            self._connections = list()
+            self._local = threading.local()
+
+    def _connect(self):
+        # Returns the calling thread's connection, opening it on first use. Connections
+        # left behind by threads that have exited are closed as new ones are opened.
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            import sqlite3
+            db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA synchronous=NORMAL")
+            with self._connections_lock:
+                for thread, other in self._connections:
+                    if not thread.is_alive():
+                        other.close()
+                self._connections = [(thread, other) for thread, other in self._connections if thread.is_alive()]
+                self._connections.append((threading.current_thread(), db))
+                self._local.db = db
+        return db
+
+
+class CatalogIndex(object):
+    """
+    Saves the linked achievement, reward, and icon catalogs to disk so that new processes
+    load them with one read instead of parsing and linking the catalog
+    payloads again. There is one index file per locale. It records the hash of the payloads
+    it was built from and the format version. Files written by another version are ignored
+    and rebuilt.
+
+    Index files are pickles, so only use a folder that you trust.
+
+    :param index_path: The path to a pre-existing writable folder to keep index files in.
+    """
+    #: Bumped whenever the catalog models change shape
+    VERSION = 1
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        if not os.path.exists(self.index_path):
+            raise ValueError("Index path does not exist: "+self.index_path)
+
+    def load(self, locale):
+        """
+        Returns a dict of ``payload_hash``, ``built`` time, and ``catalogs`` saved for the
+        locale. Returns None when there is no usable index.
+        """
+        try:
+            index_file = open(self._path(locale), 'rb')
+        except (IOError, OSError):
+            return None
+
+        # The catalogs are unpickled straight from the file, after the header line
+        try:
+            header = json.loads(index_file.readline().decode('utf8'))
+            if header.get('version') != self.VERSION or header.get('locale') != locale:
+                return None
+            # The catalogs are thousands of small objects that would otherwise set off several
+            # garbage collection passes while loading
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                header['catalogs'] = pickle.load(index_file)
+            finally:
+                if enabled:
+                    gc.enable()
+            return header
+        except Exception:
+            return None
+        finally:
+            index_file.close()
+
+    def save(self, locale, payload_hash, catalogs):
+        """Save the catalogs built from the payloads with the given hash for the locale."""
+        header = dict(version=self.VERSION, locale=locale, payload_hash=payload_hash, built=time.time())
+        contents = json.dumps(header).encode('utf8') + b'\n' + pickle.dumps(catalogs, 2)
+        _atomic_write(self._path(locale), contents)
+
+    def _path(self, locale):
+        return os.path.join(self.index_path, "catalog.{0}.idx".format(locale))
+
+
+class MemoryCache(object):
+    """
+    :param max_entries: The number of entries to hold before evicting the least recently used.
+    :param ttls: A dict of data type -> seconds entries of that type stay in memory.
+        Data types without a ttl stay until they are evicted.
+    :param cache: An optional cache to layer the memory cache in front of. Misses are read
+        from it and writes go through to it.
+
+    A bounded, thread-safe, in-memory cache. The data type of ``/api/sc2/ladder/150982`` is
+    ``ladder``. The :attr:`hits`, :attr:`misses`, :attr:`evictions`, and :attr:`expirations`
+    counters track how well the cache is working.
+    """
+    def __init__(self, max_entries=1000, ttls=None, cache=None):
+        self.max_entries = max_entries
+        self.ttls = ttls or dict()
+        self.cache = cache if cache is not None else NoCache()
+
+        #: The number of lookups answered from memory
+        self.hits = 0
+
+        #: The number of lookups that weren't in memory
+        self.misses = 0
+
+        #: The number of entries dropped to stay under max_entries
+        self.evictions = 0
+
+        #: The number of entries dropped because their ttl ran out
+        self.expirations = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._get(key)
+            if value is not _missing:
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = self.cache[key]
+        with self._lock:
+            self._set(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._set(key, value)
+        self.cache[key] = value
+
+    def __contains__(self, key):
+        with self._lock:
+            if self._get(key) is not _missing:
+                return True
+        return key in self.cache
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Drop everything held in memory. The backing cache is left alone."""
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return _missing
+        expires, value = entry
+        if expires is not None and expires <= _clock():
+            self.expirations += 1
+            return _missing
+        # Reinsert to mark the entry as most recently used
+        self._entries[key] = entry
+        return value
+
+    def _set(self, key, value):
+        ttl = self.ttls.get(_parse_path(key[2])[0])
+        self._entries.pop(key, None)
+        self._entries[key] = (_clock() + ttl if ttl is not None else None, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+# Atomically moves a file into place, replacing any existing file
+_replace = getattr(os, 'replace', os.rename)
+
+
+def _atomic_write(path, contents):
+    # Writes the bytes to a temporary file next to the path and moves it into place, so
+    # readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(contents)
+        os.chmod(temp_path, 0o644)
+        _replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+# Marks cache misses where None could be a valid value
+_missing = object()
+
+
+def _parse_path(path):
+    # Splits an api path like /api/sc2/ladder/150982 into its data type and key
+    parts = path[9:].strip("/").split("/")
+    return parts[0], '_'.join(parts[1:])
+
+
+class RetryPolicy(object):
+    """
+    :param max_attempts: The total number of attempts made for a request, including the first.
+    :param backoff: The base delay in seconds. It doubles with each failed attempt.
+    :param max_backoff: The upper bound in seconds on the delay between attempts.
+    :param retry_statuses: The HTTP status codes that are retried.
+    :param jitter: When True, a random delay between zero and the backoff is used so that
+        parallel workers don't retry in lock step.
+
+    Controls how :meth:`SC2BnetFactory.load_data` retries connection errors, timeouts, and
+    the given status codes. Other failures, such as a 404 :class:`SC2BnetError`, are raised
+    immediately. A ``Retry-After`` header on the response is honored when present.
+    """
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30, retry_statuses=(429, 500, 502, 503, 504),
+                 jitter=True):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+        self.jitter = jitter
+
+    def delay(self, attempt, response=None):
+        """Returns the number of seconds to wait after the given failed attempt."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            delay = max(delay, min(self.max_backoff, int(retry_after)))
+        return delay
+
+
+class SessionTransport(object):
+    """
+    :param pool_size: The maximum number of connections kept open to each host.
+    :param keep_alive: When False, connections are closed after every request.
+    :param verify: Passed through to requests to control SSL certificate verification.
+
+    Sends requests through one :class:`requests.Session` per host so that connections, and
+    the TLS handshakes that come with them, are reused across calls to
+    :meth:`SC2BnetFactory.load_data`. Any object with a compatible :meth:`get` method can
+    be given to the factory as a transport instead.
+    """
+    def __init__(self, pool_size=10, keep_alive=True, verify=True):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.verify = verify
+        self._sessions = dict()
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        """Issue a GET request for the url and return the :class:`requests.Response`."""
+        headers = dict(headers or {})
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
+        session = self.session(urlparse(url).netloc)
+        return session.get(url, headers=headers, timeout=timeout, verify=self.verify)
+
+    def session(self, host):
+        """Returns the pooled :class:`requests.Session` for the host, creating it if needed."""
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                self._mount(session)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def reserve(self, connections):
+        """
+        Grows the pool to keep at least ``connections`` open to each host, so that many
+        threads sharing the transport don't open and drop connections past the pool size.
+        """
+        with self._lock:
+            if connections > self.pool_size:
+                self.pool_size = connections
+                for session in self._sessions.values():
+                    self._mount(session)
+
+    def _mount(self, session):
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
 class SC2BnetFactory(object):
     """
     :param preferred_locale: The locale to use when available. Not all regions support all locals.
     :param app_key: Your application key. When non-null it is used to sign your requests to the Web API.
     :param cache_dir: The path to a pre-existing writable folder to cache responses in.
+    :param transport: The object used to send requests. Defaults to a :class:`SessionTransport`.
+    :param rate_limiter: An optional :class:`RateLimiter` consulted before every request.
+    :param timeout: A ``(connect, read)`` tuple of timeouts in seconds for each request.
+    :param retry: The :class:`RetryPolicy` for transient request failures.
+    :param ttls: A dict of data type -> seconds that cached entries stay fresh, e.g.
+        ``dict(data=7*86400, profile=3600, ladder=300)``. Data types without a ttl never go stale.
+    :param stale_while_revalidate: When True, stale cache entries are returned immediately
+        and refreshed in the background.
+    :param error_ttl: The number of seconds to cache :class:`SC2BnetError` results for.
+        Errors aren't cached when this is None.
+    :param error_codes: The error codes to cache when error_ttl is set. Defaults to just 404.
+    :param identity_map: When True, references to the same player or ladder share a single
+        :class:`PlayerProfile` or :class:`Ladder` object for as long as it is in use.
+    :param lazy_profiles: When True, profile sections that link to the achievement, reward, and
+        icon catalogs are parsed on first access. See :meth:`PlayerProfile.load_details`.
+    :param catalog_index: An optional :class:`CatalogIndex` to load the linked catalogs from.
+        Indexes older than the ``data`` ttl are checked against the catalog payloads.
+    :param host_concurrency: The most requests to have in flight to each host at once, or a
+        dict of host -> limit. Hosts without a limit are not limited.
     """
-    def __init__(self, preferred_locale=None, public_key=None, private_key=None, cache=None):
+    #: The most stale entries refreshed in the background at once
+    revalidate_workers = 4
+
+    def __init__(self, preferred_locale=None, public_key=None, private_key=None, cache=None, transport=None,
+                 rate_limiter=None, timeout=None, retry=None, ttls=None, stale_while_revalidate=None,
+                 error_ttl=None, error_codes=None, identity_map=False, lazy_profiles=False, catalog_index=None,
+                 host_concurrency=None):
         self.cache = NoCache()
+        self.transport = SessionTransport()
+        self.rate_limiter = None
+        self.timeout = DEFAULT_TIMEOUT
+        self.retry = RetryPolicy()
+        self.ttls = dict()
+        self.stale_while_revalidate = False
+        self.error_ttl = None
+        self.error_codes = (404,)
+        self.catalog_index = None
+        self.host_concurrency = None
+        self._host_slots = dict()
         self.preferred_locale = 'en_US'
-        self.configure(preferred_locale, public_key, private_key, cache)
-
-        self.__icon = dict()
-        self.__reward = dict()
-        self.__category = dict()
-        self.__achievement = dict()
-
-    def configure(self, preferred_locale=None, public_key=None, private_key=None, cache=None):
+        self.configure(preferred_locale, public_key, private_key, cache, transport, rate_limiter, timeout, retry,
+                       ttls, stale_while_revalidate, error_ttl, error_codes, catalog_index, host_concurrency)
+
+        self._revalidating = set()
+        self._revalidate_lock = threading.Lock()
+        self._revalidate_executor = None
+        self._closed = False
+        self._flights = dict()
+        self._flights_lock = threading.Lock()
+        self._host_slots_lock = threading.Lock()
+        self._catalog_lock = threading.RLock()
+
+        # Holds the time each load_regions worker thread has to finish its requests by
+        self._deadline = threading.local()
+
+        self.identity_map = identity_map
+        self.lazy_profiles = lazy_profiles
+        self._profiles = weakref.WeakValueDictionary()
+        self._ladders = weakref.WeakValueDictionary()
+        self._identity_lock = threading.Lock()
+
+        # locale -> catalog name -> catalog
+        self._catalogs = dict()
+
+    def configure(self, preferred_locale=None, public_key=None, private_key=None, cache=None, transport=None,
+                  rate_limiter=None, timeout=None, retry=None, ttls=None, stale_while_revalidate=None,
+                  error_ttl=None, error_codes=None, catalog_index=None, host_concurrency=None):
         self.public_key = public_key
         self.private_key = private_key
         if cache is not None:
             self.cache = cache
+        if transport is not None:
+            self.transport = transport
+        if rate_limiter is not None:
+            self.rate_limiter = rate_limiter
+        if timeout is not None:
+            self.timeout = timeout
+        if retry is not None:
+            self.retry = retry
+        if ttls is not None:
+            self.ttls = ttls
+        if stale_while_revalidate is not None:
+            self.stale_while_revalidate = stale_while_revalidate
+        if error_ttl is not None:
+            self.error_ttl = error_ttl
+        if error_codes is not None:
+            self.error_codes = error_codes
+        if catalog_index is not None:
+            self.catalog_index = catalog_index
+        if host_concurrency is not None:
+            self.host_concurrency = host_concurrency
+            self._host_slots = dict()
         if preferred_locale is not None:
             self.preferred_locale = preferred_locale
 
+    def reserve_connections(self, connections):
+        """
+        Makes room for ``connections`` requests to the same host at once in the transport's
+        connection pool. Transports without a ``reserve`` method are left as they are.
+        """
+        reserve = getattr(self.transport, 'reserve', None)
+        if reserve is not None:
+            reserve(connections)
+
+    def close(self, wait=True):
+        """
+        Stops the background revalidations started by :attr:`stale_while_revalidate`.
+        Queued revalidations are dropped and, when ``wait`` is True, running ones are waited
+        for. Stale entries are served without being refreshed from then on.
+        """
+        with self._revalidate_lock:
+            self._closed = True
+            executor, self._revalidate_executor = self._revalidate_executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
     def load_profile(self, region, bnet_id, realm, name):
         """Load a new :class:`PlayerProfile` using the given options. Profiles are not cached."""
-        profile = PlayerProfile(region, bnet_id, realm, name, self)
+        profile = self.get_profile(region, bnet_id, realm, name)
         profile.load_details()
         return profile
 
     def load_ladder(self, region, ladder_id, last=False):
         """Load a new :class:`Ladder` from the given id. Ladders are not cached."""
-        ladder = Ladder(region, ladder_id, self, last=last)
+        ladder = self.get_ladder(region, ladder_id, last=last)
         ladder.load_details()
         return ladder
 
+    def get_profile(self, region, bnet_id, realm, name):
+        """
+        Returns a :class:`PlayerProfile` for the character without loading anything. With the
+        identity map on, the existing object is returned if the character is already in use.
+        """
+        if not self.identity_map:
+            return PlayerProfile(region, bnet_id, realm, name, self)
+        key = (region, str(bnet_id), str(realm))
+        with self._identity_lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = PlayerProfile(region, bnet_id, realm, name, self)
+            return profile
+
+    def get_ladder(self, region, ladder_id, last=False):
+        """
+        Returns a :class:`Ladder` for the id without loading anything. With the identity map
+        on, the existing object is returned if the ladder is already in use.
+        """
+        if not self.identity_map:
+            return Ladder(region, ladder_id, self, last=last)
+        key = (region, ladder_path(ladder_id, last))
+        with self._identity_lock:
+            ladder = self._ladders.get(key)
+            if ladder is None:
+                ladder = self._ladders[key] = Ladder(region, ladder_id, self, last=last)
+            return ladder
+
+    def load_profiles(self, keys, workers=8):
+        """
+        Load many profiles from an iterable of ``(region, bnet_id, realm, name)`` tuples.
+        See :meth:`load_many` for how results are returned.
+        """
+        return self.load_many(self.load_profile, keys, workers)
+
+    def load_ladders(self, keys, workers=8):
+        """
+        Load many ladders from an iterable of ``(region, ladder_id)`` or
+        ``(region, ladder_id, last)`` tuples. See :meth:`load_many` for how results are returned.
+        """
+        return self.load_many(self.load_ladder, keys, workers)
+
+    def load_many(self, loader, keys, workers=8):
+        """
+        Calls ``loader(*key)`` for each key on a pool of ``workers`` threads and yields a
+        :class:`LoadResult` for each key as it finishes. Errors are reported on the result
+        instead of being raised so that one bad key doesn't stop the batch.
+
+        Keys are read from the iterable as workers free up so arbitrarily long (or
+        streaming) iterables can be used. The transport's connection pool is grown to
+        ``workers`` if it is smaller.
+        """
+        self.reserve_connections(workers)
+        keys = iter(keys)
+        pending = dict()
+        executor = futures.ThreadPoolExecutor(workers)
+        try:
+            for key in itertools.islice(keys, workers*2):
+                pending[executor.submit(loader, *key)] = key
+            while pending:
+                done, not_done = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    for next_key in itertools.islice(keys, 1):
+                        pending[executor.submit(loader, *next_key)] = next_key
+                    if future.exception() is not None:
+                        yield LoadResult(key, None, future.exception())
+                    else:
+                        yield LoadResult(key, future.result(), None)
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def load_regions(self, loader, args=(), regions=None, timeout=None):
+        """
+        Calls ``loader(region, *args)`` for every region at the same time, e.g.
+        ``load_regions(factory.load_ladder, ('grandmaster',))``, and returns
+        :class:`RegionResults` once each region has finished or run out of time. Regions
+        that fail don't affect the others, so the call takes as long as the slowest region.
+
+        :param regions: The regions to load from. Defaults to all of them.
+        :param timeout: The seconds to wait for each region, or a dict of region -> seconds.
+            Regions without a timeout are waited for until they finish. Regions that run out
+            of time are reported with a :class:`concurrent.futures.TimeoutError`.
+
+        A running load can't be cancelled, so the region's timeout also applies to the
+        requests the loader makes: each is sent with at most the time left, and none are
+        sent or retried once it runs out. Time spent waiting on the rate limiter, a
+        ``host_concurrency`` slot, or work the loader does itself isn't cut short, so a
+        region may still hold its thread for a while after it is reported as timed out.
+        """
+        regions = sorted(HOST_BY_REGION) if regions is None else list(regions)
+        if not regions:
+            return RegionResults(dict(), dict())
+        timeouts = timeout if isinstance(timeout, dict) else dict.fromkeys(regions, timeout)
+        start = _clock()
+
+        def load(region):
+            wait = timeouts.get(region)
+            self._deadline.time = None if wait is None else start + wait
+            try:
+                return loader(region, *args)
+            finally:
+                self._deadline.time = None
+
+        executor = futures.ThreadPoolExecutor(len(regions))
+        try:
+            pending = [(executor.submit(load, region), region) for region in regions]
+        finally:
+            executor.shutdown(wait=False)
+
+        results, errors = dict(), dict()
+        for future, region in pending:
+            wait = timeouts.get(region)
+            if wait is not None:
+                wait = max(0, wait - (_clock() - start))
+            try:
+                results[region] = future.result(wait)
+            except futures.TimeoutError:
+                future.cancel()
+                errors[region] = futures.TimeoutError("{0} timed out after {1} seconds".format(region, timeouts[region]))
+            except Exception as e:
+                errors[region] = e
+        return RegionResults(results, errors)
+
     @property
     def icon(self):
         """
         A nested dict of url -> offset -> :class:`Icon` containing all possible icons.
-        Lazy loaded and cached in the factory locale.
+        Lazy loaded and cached for the preferred locale, see also :meth:`get_icons`.
         """
-        if not self.__icon:
-            for item in itertools.chain(self.achievement.values(), self.reward.values()):
-                if item.icon.offset in self.__icon.get(item.icon.url, {}):
-                    pass  # print("Reused Icon: {0}, {1}".format(item.icon.url, item.icon.offset))
-                self.__icon.setdefault(item.icon.url, dict())[item.icon.offset] = item.icon
-        return self.__icon
+        return self.get_icons()
 
     @property
     def achievement(self):
         """
         A  dict of achivementId -> :class:`Achievement` containing all possible achievements.
-        Lazy loaded and cached in the factory locale.
+        Lazy loaded and cached for the preferred locale, see also :meth:`get_achievements`.
         """
-        def add_category(category):
-            self.__category[category.id] = category
-            for subcategory in category.subcategories:
-                add_category(subcategory)
-
-        if not self.__achievement:
-            data = self.load_data(self.default_host, "/api/sc2/data/achievements")
-            for item in data['categories']:
-                add_category(AchievementCategory(item, self))
-            for item in data['achievements']:
-                self.__achievement[item['achievementId']] = Achievement(item, self)
-            for category in self.__category.values():
-                achievement_id = category.featured_achievement_id
-                if achievement_id in self.__achievement:
-                    # print("Found {0}".format(achievement_id))
-                    category.featured_achievement = self.__achievement[achievement_id]
-                elif achievement_id != 0:
-                    msg = "Unknown achievement id: {0} for category {1} [{2}]"
-                    # print(msg.format(achievement_id, category.title, category.id))
-            for achievement in self.__achievement.values():
-                achievement.category = self.__category[achievement.category_id]
-        return self.__achievement
+        return self.get_achievements()
 
     @property
     def reward(self):
         """
         A  dict of rewardId -> :class:`Reward` containing all possible rewards.
-        Lazy loaded and cached in the factory locale.
+        Lazy loaded and cached for the preferred locale, see also :meth:`get_rewards`.
         """
-        if not self.__reward:
-            data = self.load_data(self.default_host, "/api/sc2/data/rewards")
-            for item in sum(data.values(), []):
-                self.__reward[item['id']] = Reward(item, self)
-        return self.__reward
+        return self.get_rewards()
+
+    def get_icons(self, locale=None):
+        """Returns the :attr:`icon` catalog for the locale, or the preferred locale by default."""
+        return self._get_catalog('icon', locale)
+
+    def get_achievements(self, locale=None):
+        """Returns the :attr:`achievement` catalog for the locale, or the preferred locale by default."""
+        return self._get_catalog('achievement', locale)
+
+    def get_rewards(self, locale=None):
+        """Returns the :attr:`reward` catalog for the locale, or the preferred locale by default."""
+        return self._get_catalog('reward', locale)
+
+    def _get_catalog(self, name, locale):
+        # Catalogs are built into new dicts and published when complete so that other
+        # threads never see a partially built catalog. Each locale's catalogs are loaded
+        # on first use and kept for the life of the factory.
+        locale = locale or self.preferred_locale
+        catalogs = self._catalogs.get(locale, {})
+        if name not in catalogs:
+            with self._catalog_lock:
+                catalogs = self._catalogs.setdefault(locale, dict())
+                if name not in catalogs and not self._load_indexed_catalogs(locale):
+                    host = HOSTS_BY_LOCALE[locale][0]
+                    if name == 'achievement':
+                        data = self.load_data(host, "/api/sc2/data/achievements", locale=locale)
+                        catalogs['category'], catalogs['achievement'] = self._link_achievements(data)
+                    elif name == 'reward':
+                        data = self.load_data(host, "/api/sc2/data/rewards", locale=locale)
+                        catalogs['reward'] = self._link_rewards(data, locale)
+                    else:
+                        catalogs['icon'] = self._link_icons(self.get_achievements(locale), self.get_rewards(locale))
+        return catalogs[name]
+
+    def _link_achievements(self, data):
+        def add_category(category):
+            categories[category.id] = category
+            for subcategory in category.subcategories:
+                add_category(subcategory)
+
+        categories, achievements = dict(), dict()
+        for item in data['categories']:
+            add_category(AchievementCategory(item, self))
+        for item in data['achievements']:
+            achievements[item['achievementId']] = Achievement(item, self)
+        for category in categories.values():
+            achievement_id = category.featured_achievement_id
+            if achievement_id in achievements:
+                # print("Found {0}".format(achievement_id))
+                category.featured_achievement = achievements[achievement_id]
+            elif achievement_id != 0:
+                msg = "Unknown achievement id: {0} for category {1} [{2}]"
+                # print(msg.format(achievement_id, category.title, category.id))
+        for achievement in achievements.values():
+            achievement.category = categories[achievement.category_id]
+        return categories, achievements
+
+    def _link_rewards(self, data, locale=None):
+        rewards = dict()
+        for item in sum(data.values(), []):
+            rewards[item['id']] = Reward(item, self, locale)
+        return rewards
+
+    def _link_icons(self, achievements, rewards):
+        icons = dict()
+        for item in itertools.chain(achievements.values(), rewards.values()):
+            if item.icon.offset in icons.get(item.icon.url, {}):
+                pass  # print("Reused Icon: {0}, {1}".format(item.icon.url, item.icon.offset))
+            icons.setdefault(item.icon.url, dict())[item.icon.offset] = item.icon
+        return icons
+
+    def _load_indexed_catalogs(self, locale):
+        # Fills in all of the locale's catalogs at once from the catalog index, building and
+        # saving the index first when it is missing or out of date. Returns False when there
+        # is no index.
+        if self.catalog_index is None:
+            return False
+
+        catalogs = self._catalogs[locale]
+        index = self.catalog_index.load(locale)
+        ttl = self.ttls.get('data')
+        if index is not None and (ttl is None or time.time() - index['built'] < ttl):
+            linked = index['catalogs']
+        else:
+            host = HOSTS_BY_LOCALE[locale][0]
+            achievement_data = self.load_data(host, "/api/sc2/data/achievements", locale=locale)
+            reward_data = self.load_data(host, "/api/sc2/data/rewards", locale=locale)
+            payload = json.dumps([achievement_data, reward_data], sort_keys=True).encode('utf8')
+            payload_hash = hashlib.sha1(payload).hexdigest()
+            if index is not None and index['payload_hash'] == payload_hash:
+                linked = index['catalogs']
+            else:
+                # Rewards link to achievements through the factory, so publish those first
+                categories, achievements = self._link_achievements(achievement_data)
+                catalogs['category'], catalogs['achievement'] = categories, achievements
+                rewards = self._link_rewards(reward_data, locale)
+                linked = (categories, achievements, rewards, self._link_icons(achievements, rewards))
+            self.catalog_index.save(locale, payload_hash, linked)
+
+        catalogs['category'], catalogs['achievement'], catalogs['reward'], catalogs['icon'] = linked
+        return True
 
     @property
     def default_host(self):
         return HOSTS_BY_LOCALE[self.preferred_locale][0]
 
-    def load_data(self, host, path, refresh=False):
+    def load_data(self, host, path, refresh=False, locale=None):
+        """
+        Returns the json data for the Web API path on the host. Cached data is used unless
+        ``refresh`` is True or the entry is older than the ttl for its data type. With
+        :attr:`stale_while_revalidate` on, stale data is returned right away while a
+        background thread refreshes the entry.
+
+        The data is requested in ``locale``, or the preferred locale by default, when the
+        host supports it and in the host's default locale otherwise.
+        """
         # Figure out which localization to use
-        if host in HOSTS_BY_LOCALE[self.preferred_locale]:
-            locale = self.preferred_locale
-        else:
+        locale = locale or self.preferred_locale
+        if host not in HOSTS_BY_LOCALE[locale]:
             locale = DEFAULT_LOCALE_BY_HOST[host]
 
-        # Check the cache for an entry
+        # Check the cache for an entry. Even when refreshing, the entry's validators
+        # let the server answer with a cheap 304 if nothing has changed.
         cache_key = (host, locale, path)
-        if not refresh and cache_key in self.cache:
-            return self.cache[cache_key]
+        entry = self._get_entry(cache_key)
+        if not refresh and entry is not None:
+            if self._is_fresh(entry, path):
+                if entry.get('error') is not None:
+                    raise SC2BnetError(entry['error'])
+                return entry['data']
+            elif self.stale_while_revalidate and entry.get('error') is None:
+                self._revalidate(host, path, locale)
+                return entry['data']
+
+        return self._request_once(cache_key, host, locale, path, entry)
+
+    def _request_once(self, cache_key, host, locale, path, entry):
+        # Concurrent requests for the same cache key share a single request. The first
+        # caller makes it and the rest wait for its result.
+        with self._flights_lock:
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cache_key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.data
+
+        try:
+            entry = self._request(host, locale, path, entry)
+            flight.data = entry['data']
+
+            # Replace any existing cache entries
+            self.cache[cache_key] = entry
+            return flight.data
+        except SC2BnetError as e:
+            # Remember errors like 404 Sc2 Profile Not Found so they aren't requested again
+            if self.error_ttl is not None and e.code in self.error_codes:
+                self.cache[cache_key] = dict(_entry=CACHE_ENTRY_VERSION, fetched=time.time(), data=None, error=e.json)
+            flight.error = e
+            raise
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[cache_key]
+            flight.done.set()
 
+    def _get_entry(self, cache_key):
+        try:
+            entry = self.cache[cache_key]
+        except KeyError:
+            return None
+
+        # Entries cached by older versions hold just the data with no fetch time
+        if not (isinstance(entry, dict) and '_entry' in entry):
+            entry = dict(_entry=CACHE_ENTRY_VERSION, fetched=None, data=entry)
+        return entry
+
+    def _is_fresh(self, entry, path):
+        if entry.get('error') is not None:
+            ttl = self.error_ttl
+            if ttl is None:
+                return False
+        else:
+            ttl = self.ttls.get(_parse_path(path)[0])
+        if ttl is None:
+            return True
+        return entry['fetched'] is not None and time.time() - entry['fetched'] < ttl
+
+    def _revalidate(self, host, path, locale):
+        # Refresh the entry in the background, at most once at a time per entry
+        with self._revalidate_lock:
+            if self._closed or (host, locale, path) in self._revalidating:
+                return
+            self._revalidating.add((host, locale, path))
+
+        def revalidate():
+            try:
+                if not self._closed:
+                    self.load_data(host, path, refresh=True, locale=locale)
+            except Exception:
+                pass  # The stale entry stays in place and is tried again next time
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard((host, locale, path))
+
+        with self._revalidate_lock:
+            if self._revalidate_executor is None:
+                self._revalidate_executor = futures.ThreadPoolExecutor(self.revalidate_workers)
+            self._revalidate_executor.submit(revalidate)
+
+    def _request(self, host, locale, path, entry=None):
+        # Returns a new cache entry for the path. When the previous entry has validators
+        # the request is made conditional and a 304 response renews the previous entry.
         # If they have supplied keys, sign the request using documented method:
         #   UrlPath = <HTTP-Request-URI, from the port to the query string>
         #   StringToSign = HTTP-Verb + "\n" +
@@ -245,9 +1262,16 @@ class SC2BnetFactory(object):
             headers['Date'] = now
             headers['Authorization'] = "BNET {0}:{1}".format(self.public_key, signature)
 
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
         # Fetch new data, throwing any http errors upwards
         url = "https://"+host+path+"?locale="+locale
-        response = requests.get(url, headers=headers, verify=True)
+        response = self._send(host, url, headers)
+        if response.status_code == 304 and entry is not None:
+            return dict(entry, fetched=time.time())
 
         try:
             # Try getting data first because many error codes will also have json details.
@@ -264,13 +1288,165 @@ class SC2BnetFactory(object):
             # If the response isn't json and we didn't have an http error code then panic
             raise
 
-        # Replace any existing cache entries
-        self.cache[cache_key] = data
-        return data
+        return dict(
+            _entry=CACHE_ENTRY_VERSION,
+            fetched=time.time(),
+            data=data,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+
+    def _send(self, host, url, headers):
+        # Connection failures, timeouts, and retryable status codes are tried again
+        # after a backoff. Anything else, including json error results sent with a
+        # retryable status, is returned for load_data to sort out.
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(host, self.public_key)
+
+            response = None
+            slots = self._get_host_slots(host)
+            try:
+                if slots is None:
+                    response = self.transport.get(url, headers=headers, timeout=self._get_timeout())
+                else:
+                    with slots:
+                        response = self.transport.get(url, headers=headers, timeout=self._get_timeout())
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retry.max_attempts:
+                    raise
+            else:
+                if (attempt >= self.retry.max_attempts or response.status_code not in self.retry.retry_statuses
+                        or _is_api_error(response)):
+                    return response
+
+            delay = self.retry.delay(attempt, response)
+            deadline = getattr(self._deadline, 'time', None)
+            if deadline is not None and _clock() + delay >= deadline:
+                if response is not None:
+                    return response
+                raise requests.Timeout("Ran out of time to retry " + url)
+            time.sleep(delay)
+            attempt += 1
+
+    def _get_timeout(self):
+        # The request timeout, cut down to the time left before the thread's deadline
+        deadline = getattr(self._deadline, 'time', None)
+        if deadline is None:
+            return self.timeout
+        left = deadline - _clock()
+        if left <= 0:
+            raise requests.Timeout("Ran out of time before sending the request")
+        if self.timeout is None:
+            return left
+        if isinstance(self.timeout, tuple):
+            return tuple(min(value, left) for value in self.timeout)
+        return min(self.timeout, left)
+
+    def _get_host_slots(self, host):
+        # Returns the semaphore limiting requests in flight to the host, if any
+        limit = self.host_concurrency
+        if isinstance(limit, dict):
+            limit = limit.get(host)
+        if limit is None:
+            return None
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(limit)
+            return self._host_slots[host]
+
+
+def _is_api_error(response):
+    # True when the response body is a Web API error result, which won't change on a retry
+    try:
+        data = response.json()
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get('status', None) == 'nok'
+
+
+class _Flight(object):
+    # A request in progress that other callers can wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+        self.error = None
+
+
+class AsyncSC2BnetFactory(object):
+    """
+    :param factory: The :class:`SC2BnetFactory` to load resources with. When omitted a new
+        factory is created from the remaining keyword options.
+    :param concurrency: The maximum number of requests in flight at once.
+
+    An asyncio counterpart to :class:`SC2BnetFactory`. Each loader returns an awaitable
+    that runs the matching blocking loader on a bounded thread pool, so the resources
+    produced are the same :class:`PlayerProfile` and :class:`Ladder` objects::
+
+        bnet = sc2bnet.AsyncSC2BnetFactory(concurrency=100)
+        profiles = await asyncio.gather(*[bnet.load_profile(*key) for key in keys])
+    """
+    def __init__(self, factory=None, concurrency=16, **options):
+        # Imported here since asyncio is slow to import and most users don't need it
+        try:
+            import asyncio
+        except ImportError:
+            raise RuntimeError("AsyncSC2BnetFactory requires asyncio")
+        self._wrap_future = asyncio.wrap_future
+        if factory is None and options.get('transport') is None:
+            options['transport'] = SessionTransport(pool_size=concurrency)
+        self.factory = factory or SC2BnetFactory(**options)
+        self.factory.reserve_connections(concurrency)
+        self.concurrency = concurrency
+        self._executor = futures.ThreadPoolExecutor(concurrency)
+
+    def load_data(self, host, path, refresh=False, locale=None):
+        """Awaitable version of :meth:`SC2BnetFactory.load_data`."""
+        return self._submit(self.factory.load_data, host, path, refresh, locale)
+
+    def load_catalog(self, locale=None):
+        """Awaitable that loads the achievement, reward, and icon catalogs for the locale."""
+        return self._submit(self.factory.get_icons, locale)
+
+    def load_profile(self, region, bnet_id, realm, name):
+        """Awaitable version of :meth:`SC2BnetFactory.load_profile`."""
+        profile = self.factory.get_profile(region, bnet_id, realm, name)
+        return self._submit(self._load_details, profile)
+
+    def load_ladder(self, region, ladder_id, last=False):
+        """Awaitable version of :meth:`SC2BnetFactory.load_ladder`."""
+        ladder = self.factory.get_ladder(region, ladder_id, last=last)
+        return self._submit(self._load_details, ladder)
+
+    def load_details(self, resource):
+        """Awaitable call to ``load_details`` on a :class:`PlayerProfile` or :class:`Ladder`."""
+        return self._submit(self._load_details, resource)
+
+    def load_matches(self, profile):
+        """Awaitable version of :meth:`PlayerProfile.load_matches`."""
+        return self._submit(profile.load_matches)
+
+    def load_ladders(self, profile):
+        """Awaitable version of :meth:`PlayerProfile.load_ladders`."""
+        return self._submit(profile.load_ladders)
+
+    def close(self):
+        """Shut down the worker threads once pending loads are done."""
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, func, *args):
+        return self._wrap_future(self._executor.submit(func, *args))
+
+    def _load_details(self, resource):
+        resource.load_details()
+        return resource
 
 
 class Achievement(object):
     """Represents a battle.net achievement"""
+    __slots__ = ('title', 'description', 'id', 'category_id', 'category', 'points', 'icon')
+
     def __init__(self, data, factory):
         #: The title of the achievement.
         self.title = data['title']
@@ -320,6 +1496,8 @@ class Icon(object):
 
     TODO: Extract the actual icon, cache the compound image.
     """
+    __slots__ = ('title', 'x', 'y', 'width', 'height', 'offset', 'url')
+
     def __init__(self, title, data, factory):
         #: The working title for the icon
         self.title = title
@@ -346,7 +1524,7 @@ class Icon(object):
 
 class Reward(object):
     """Represents a Battle.net reward."""
-    def __init__(self, data, factory):
+    def __init__(self, data, factory, locale=None):
         #: The title of this award
         self.title = data['title']
 
@@ -362,10 +1540,11 @@ class Reward(object):
         #: A reference to the :class:`Achievement` that unlocks this reward. None if none needed.
         self.achievement = None
         if data['achievementId'] != 0:
-            if data['achievementId'] not in factory.achievement:
+            achievements = factory.get_achievements(locale)
+            if data['achievementId'] not in achievements:
                 pass  # print("{0} not found".format(data['achievementId']))
             else:
-                self.achievement = factory.achievement[data['achievementId']]
+                self.achievement = achievements[data['achievementId']]
 
 
 class PlayerProfile(object):
@@ -386,6 +1565,14 @@ class PlayerProfile(object):
     def __init__(self, region, bnet_id, realm, name, factory):
         self._factory = factory
 
+        # Raw json for sections that haven't been linked to the factory catalogs yet
+        self._unparsed = dict()
+        self._link_lock = threading.Lock()
+        self._portrait = None
+        self._achievements = dict()
+        self._rewards_earned = list()
+        self._rewards_selected = list()
+
         #: The region of Battle.net this character belongs to
         self.region = region
 
@@ -407,9 +1594,6 @@ class PlayerProfile(object):
         #: The tag of the clan the player belongs to.
         self.clan_tag = str()
 
-        #: A reference to the :class:`Icon` object the player is currently using as a portrait
-        self.portrait = None
-
         #: One of ZERG, PROTOSS, TERRAN, or RANDOM
         self.primary_race = str()
 
@@ -467,21 +1651,12 @@ class PlayerProfile(object):
         #: The player's current XP progress to the next Protoss level. -1 if at max level.
         self.protoss_level_xp = int()
 
-        #: A dict of achivement -> completion date for achivements completed by this player.
-        self.achievements = dict()
-
         #: The total point value of all achievements completed by this player.
         self.total_achievement_points = 0
 
         #: A dict category -> points that breaks the total achievement points down by category.
         self.achievement_points_by_category = dict()
 
-        #: A list of rewards this player has earned
-        self.rewards_earned = list()
-
-        #: A list of the earned rewards selected to be showcased.
-        self.rewards_selected = list()
-
         #: A list of recent matches played by the player
         self.recent_matches = list()
 
@@ -491,16 +1666,78 @@ class PlayerProfile(object):
         #: The reference to the `Season` object for the previous season
         self.previous_season = None
 
-    def load_details(self):
+    @property
+    def portrait(self):
+        """A reference to the :class:`Icon` object the player is currently using as a portrait"""
+        return self._link('portrait', lambda data: self._factory.icon[data['url']][data['offset']])
+
+    @portrait.setter
+    def portrait(self, value):
+        self._assign('portrait', value)
+
+    @property
+    def achievements(self):
+        """A dict of achivement -> completion date for achivements completed by this player."""
+        def link(data):
+            achievements = dict()
+            for achievement_data in data:
+                achievement = self._factory.achievement[achievement_data['achievementId']]
+                achievements[achievement] = achievement_data['completionDate']
+            return achievements
+        return self._link('achievements', link)
+
+    @achievements.setter
+    def achievements(self, value):
+        self._assign('achievements', value)
+
+    @property
+    def rewards_earned(self):
+        """A list of rewards this player has earned"""
+        return self._link('rewards_earned', lambda data: [self._factory.reward[reward_id] for reward_id in data])
+
+    @rewards_earned.setter
+    def rewards_earned(self, value):
+        self._assign('rewards_earned', value)
+
+    @property
+    def rewards_selected(self):
+        """A list of the earned rewards selected to be showcased."""
+        return self._link('rewards_selected', lambda data: [self._factory.reward[reward_id] for reward_id in data])
+
+    @rewards_selected.setter
+    def rewards_selected(self, value):
+        self._assign('rewards_selected', value)
+
+    def _link(self, name, link):
+        # Links a section's raw json to the catalogs on first access. The raw json is only
+        # dropped once linking succeeds, so a failed catalog load can be tried again and
+        # other threads wait for the linked value instead of seeing an empty one.
+        if name in self._unparsed:
+            with self._link_lock:
+                if name in self._unparsed:
+                    setattr(self, '_' + name, link(self._unparsed[name]))
+                    del self._unparsed[name]
+        return getattr(self, '_' + name)
+
+    def _assign(self, name, value):
+        with self._link_lock:
+            self._unparsed.pop(name, None)
+            setattr(self, '_' + name, value)
+
+    def load_details(self, lazy=None):
         """
         Loads the majority of the player profile data. Everything except for
         :attr:`current_season`, :attr:`previous_season`, and :attr:`recent_matches`.
+
+        :param lazy: When True, :attr:`portrait`, :attr:`achievements`, :attr:`rewards_earned`,
+            and :attr:`rewards_selected` are only linked to the factory catalogs when first
+            accessed, so the catalogs aren't loaded for profiles that don't use them. Defaults
+            to the factory's ``lazy_profiles`` setting.
         """
         api_path = "/api/sc2/profile/{id}/{realm}/{name}/".format(**self.__dict__)
         data = self._factory.load_data(HOST_BY_REGION[self.region], api_path)
         self.clan_name = data['clanName']
         self.clan_tag = data['clanTag']
-        self.portrait = self._factory.icon[data['portrait']['url']][data['portrait']['offset']]
 
         self.primary_race = data['career']['primaryRace']
         self.terran_wins = data['career']['terranWins']
@@ -530,20 +1767,15 @@ class PlayerProfile(object):
         for category_id, points in data['achievements']['points']['categoryPoints'].items():
             self.achievement_points_by_category[category_id] = points
 
-        self.achievements = dict()
-        for achievement_data in data['achievements']['achievements']:
-            achievement = self._factory.achievement[achievement_data['achievementId']]
-            self.achievements[achievement] = achievement_data['completionDate']
-
-        self.rewards_earned = list()
-        for reward_id in data['rewards']['earned']:
-            reward = self._factory.reward[reward_id]
-            self.rewards_earned.append(reward)
-
-        self.rewards_selected = list()
-        for reward_id in data['rewards']['selected']:
-            reward = self._factory.reward[reward_id]
-            self.rewards_selected.append(reward)
+        self._unparsed = dict(
+            portrait=data['portrait'],
+            achievements=data['achievements']['achievements'],
+            rewards_earned=data['rewards']['earned'],
+            rewards_selected=data['rewards']['selected'],
+        )
+        if not (self._factory.lazy_profiles if lazy is None else lazy):
+            for name in list(self._unparsed):
+                getattr(self, name)
 
     def load_matches(self):
         """Loads recent matches into the :attr:`recent_matches` attribute."""
@@ -564,8 +1796,75 @@ class PlayerProfile(object):
         self.previous_season = Season(data['previousSeason'], self, self.current_season_number-1, last=True)
 
 
+class CharacterRef(object):
+    """
+    A lightweight reference to a character listed on a ladder or team. The full
+    :class:`PlayerProfile` is only built when it is needed, through :attr:`profile` or one
+    of the load methods. Other profile attributes are read from the full profile.
+    """
+    __slots__ = ('region', 'id', 'realm', 'name', 'clan_name', 'clan_tag', '_factory', '_profile')
+
+    def __init__(self, region, bnet_id, realm, name, factory, clan_name='', clan_tag=''):
+        #: The region of Battle.net this character belongs to
+        self.region = region
+
+        #: The character's unique Battle.net id.
+        self.id = bnet_id
+
+        #: The id for the character's home realm in the region
+        self.realm = realm
+
+        #: The character's current name
+        self.name = name
+
+        #: The name of the clan the player belongs to.
+        self.clan_name = clan_name
+
+        #: The tag of the clan the player belongs to.
+        self.clan_tag = clan_tag
+
+        self._factory = factory
+        self._profile = None
+
+    @classmethod
+    def from_data(cls, region, data, factory):
+        return cls(region, data['id'], data['realm'], data['displayName'], factory, data['clanName'], data['clanTag'])
+
+    @property
+    def profile(self):
+        """The full :class:`PlayerProfile` for this character. Details are not loaded."""
+        if self._profile is None:
+            profile = self._factory.get_profile(self.region, self.id, self.realm, self.name)
+            profile.clan_name = self.clan_name
+            profile.clan_tag = self.clan_tag
+            self._profile = profile
+        return self._profile
+
+    def load_details(self):
+        """Calls :meth:`PlayerProfile.load_details` and returns the profile."""
+        self.profile.load_details()
+        return self.profile
+
+    def load_matches(self):
+        """Calls :meth:`PlayerProfile.load_matches` and returns the profile."""
+        self.profile.load_matches()
+        return self.profile
+
+    def load_ladders(self):
+        """Calls :meth:`PlayerProfile.load_ladders` and returns the profile."""
+        self.profile.load_ladders()
+        return self.profile
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.profile, name)
+
+
 class Match(object):
     """Represents a single match played by a player."""
+    __slots__ = ('map', 'type', 'result', 'speed', 'end_time')
+
     def __init__(self, data, factory):
         #: The map the match was played on
         self.map = data['map']
@@ -619,18 +1918,12 @@ class Team(object):
         #: A back reference to the :class:`Season` this team is a part of.
         self.season = season
 
-        #: A list of :class:`PlayerProfile` references for members of the team
-        self.members = list()
+        #: A list of :class:`CharacterRef` references for members of the team
+        self.members = [CharacterRef.from_data(self.region, item, factory) for item in data['characters']]
 
         #: A list of :class:`TeamRanking` references for ranks achieved by this team in this season.
         self.rankings = [TeamRanking(item, self, factory, last=last) for item in data['ladder']]
 
-        for item in data['characters']:
-            character = PlayerProfile(self.region, item['id'], item['realm'], item['displayName'], factory)
-            character.clan_name = item['clanName']
-            character.clan_tag = item['clanTag']
-            self.members.append(character)
-
 
 class TeamPlacement(object):
     """Represents a team's placement matches from the profile/ladders view."""
@@ -658,12 +1951,14 @@ class TeamPlacement(object):
 
 class TeamRanking(object):
     """Represents a team's ladder ranking from the profile/ladders view."""
+    __slots__ = ('region', 'ladder', 'team', 'wins', 'losses', 'rank', 'showcase')
+
     def __init__(self, data, team, factory, last=False):
         #: The region the team ranking is on.
         self.region = team.region
 
         #: A link to the corresponding :class:`Ladder`.
-        self.ladder = Ladder(self.region, data['ladderId'], factory, last=last)
+        self.ladder = factory.get_ladder(self.region, data['ladderId'], last=last)
         self.ladder.name = data['ladderName']
         self.ladder.division = data['division']
         self.ladder.league = data['league']
@@ -697,6 +1992,9 @@ class Ladder(object):
         #: The region the ladder is active on
         self.region = region
 
+        #: True for last season's rankings. Only the grandmaster ladder has these.
+        self.last = last
+
         #: The name of the ladder
         self.name = str()
 
@@ -727,25 +2025,69 @@ class Ladder(object):
 
         self._factory = factory
 
-    def load_details(self):
-        """Load additional ladder details from the Web API."""
-        api_path = "/api/sc2/ladder/{0}".format(self.id)
-        data = self._factory.load_data(HOST_BY_REGION[self.region], api_path)
+    def load_details(self, refresh=False):
+        """
+        Load additional ladder details from the Web API. When refresh is True the cache is
+        skipped.
+        """
+        api_path = ladder_path(self.id, self.last)
+        data = self._factory.load_data(HOST_BY_REGION[self.region], api_path, refresh=refresh)
 
         self.rankings = [LadderRanking(item, self, self._factory) for item in data['ladderMembers']]
-
-         # TODO: Is this how their sorting really works? How are ties broken?
-        self.rankings.sort(key=lambda r: r.points, reverse=True)
+        self.rank = dict()
+        self.rankings.sort(key=ranking_order)
         for r, ranking in enumerate(self.rankings):
             self.rank[r+1] = ranking
             ranking.rank = r+1
 
+    def reload(self):
+        """
+        Loads the ladder again, skipping the cache, and returns a :class:`LadderDiff` of what
+        changed since the rankings were last loaded.
+        """
+        rankings = self.rankings
+        self.load_details(refresh=True)
+        return diff_rankings(rankings, self.rankings)
+
+    def diff(self, previous):
+        """
+        Returns a :class:`LadderDiff` from a previously loaded copy of this ladder, or a
+        :meth:`snapshot` of one, to this one.
+        """
+        if isinstance(previous, dict):
+            return diff_rankings(previous, self.rankings)
+        return diff_rankings(previous.rankings, self.rankings)
+
+    def snapshot(self):
+        """
+        Returns the rankings as plain data, a dict of :attr:`LadderRanking.key` ->
+        ``(rank, points, wins, losses)``. Unlike the ladder it holds no reference to the
+        factory, so it can be pickled and diffed against a later load of the ladder.
+        """
+        return dict((ranking.key, tuple(getattr(ranking, name) for name in DIFF_FIELDS)) for ranking in self.rankings)
+
+    def to_columns(self):
+        """Returns the ladder's rankings as :class:`LadderColumns`."""
+        return ladder_columns([self])
+
+
+def ladder_path(ladder_id, last=False):
+    """Returns the Web API path for a ladder. Only the grandmaster ladder has last season's rankings."""
+    if last and str(ladder_id) == 'grandmaster':
+        return "/api/sc2/ladder/grandmaster/last"
+    return "/api/sc2/ladder/{0}".format(ladder_id)
+
 
 class LadderRanking(object):
     """
     Represents a ladder ranking for a team. Depending on how the ladder ranking
     was loaded, different attributes are available.
     """
+    __slots__ = (
+        'region', 'ladder', 'players', 'rank', 'previous_rank', 'highest_rank',
+        'wins', 'losses', 'points', 'join_time', 'join_timestamp', 'favorite_races',
+    )
+
     def __init__(self, data, ladder, factory):
         #: The region this ladder ranking is on.
         self.region = ladder.region
@@ -753,14 +2095,9 @@ class LadderRanking(object):
         #: A reference to the :class:`Ladder` object this ranking is for.
         self.ladder = ladder
 
-        item = data['character']
-        character = PlayerProfile(self.region, item['id'], item['realm'], item['displayName'], factory)
-        character.clan_name = item['clanName']
-        character.clan_tag = item['clanTag']
-
-        #: The players on the team for this ranking. Because of a bug in the WebAPI, there will only
-        #: be one player here no matter how big the team. Hopefully a future update will fix this.
-        self.players = [character]
+        #: The :class:`CharacterRef` players on the team for this ranking. Because of a bug in the WebAPI,
+        #: there will only be one player here no matter how big the team. Hopefully a future update will fix this.
+        self.players = [CharacterRef.from_data(self.region, data['character'], factory)]
 
         #: The current team rank.
         self.rank = None
@@ -783,6 +2120,9 @@ class LadderRanking(object):
         #: The time the team joined the ladder.
         self.join_time = datetime.fromtimestamp(data['joinTimestamp'])
 
+        #: The time the team joined the ladder as a unix timestamp.
+        self.join_timestamp = data['joinTimestamp']
+
         #: A list of the favored races for each player while playing in this ladder. One of TERRAN
         #: ZERG, PROTOSS; not sure if RANDOM is a valid race here.
         self.favorite_races = list()
@@ -791,6 +2131,344 @@ class LadderRanking(object):
             if key in data:
                 self.favorite_races.append(data[key])
 
+    @property
+    def key(self):
+        """A tuple of ``(bnet_id, realm)`` for the team's players that identifies the ranking on its ladder."""
+        return tuple((player.id, player.realm) for player in self.players)
+
+
+def ranking_order(ranking):
+    """
+    The sort key for ladder rankings: most points first, ties broken by most wins and then
+    by who joined the ladder first.
+    """
+    return -ranking.points, -ranking.wins, ranking.join_timestamp
+
+
+def top_rankings(rankings, count):
+    """Returns the best ``count`` rankings in order without sorting all of them."""
+    return heapq.nsmallest(count, rankings, key=ranking_order)
+
+
+def merge_rankings(ladders, count=None):
+    """
+    Merges the rankings of many loaded ladders, for league or region wide ranks, and yields
+    ``(rank, ranking)`` pairs best first. Each ladder's rankings are already in order so the
+    merge only looks at the head of each ladder. Stop after ``count`` rankings when given.
+    """
+    def keyed(index, rankings):
+        for ranking in rankings:
+            yield ranking_order(ranking), index, ranking
+
+    merged = heapq.merge(*[keyed(index, ladder.rankings) for index, ladder in enumerate(ladders)])
+    for rank, (key, index, ranking) in enumerate(itertools.islice(merged, count), 1):
+        yield rank, ranking
+
+
+#: The :class:`LadderRanking` fields compared by :func:`diff_rankings`
+DIFF_FIELDS = ('rank', 'points', 'wins', 'losses')
+
+
+def diff_rankings(old, new, fields=DIFF_FIELDS):
+    """
+    Compares two loads of a ladder's rankings, matching teams by :attr:`LadderRanking.key`,
+    and returns a :class:`LadderDiff` of only the teams that joined, left, or changed in
+    any of the given fields.
+
+    ``old`` may also be a :meth:`Ladder.snapshot`, in which case its teams are reported as
+    :class:`RankingSnapshot` and only the :data:`DIFF_FIELDS` can be compared.
+    """
+    if isinstance(old, dict):
+        previous = dict((key, RankingSnapshot(key, *values)) for key, values in old.items())
+    else:
+        previous = dict((ranking.key, ranking) for ranking in old)
+    added = list()
+    changed = list()
+    for ranking in new:
+        before = previous.pop(ranking.key, None)
+        if before is None:
+            added.append(ranking)
+        elif any(getattr(before, name) != getattr(ranking, name) for name in fields):
+            changed.append((before, ranking))
+    return LadderDiff(added, list(previous.values()), changed)
+
+
+# The array typecode for the numeric ladder columns. 'q' is missing before Python 3.3, so
+# fall back on a C long where it is 64 bits and on a double, exact to 2**53, elsewhere.
+# Typecodes can't be unicode on Python 2.
+if 'q' in getattr(array, 'typecodes', ''):
+    _INT64_TYPECODE = str('q')
+elif array.array(str('l')).itemsize >= 8:
+    _INT64_TYPECODE = str('l')
+else:
+    _INT64_TYPECODE = str('d')
+
+
+class LadderColumns(object):
+    """
+    A columnar snapshot of ladder rankings for analysis. Use :meth:`Ladder.to_columns` or
+    :func:`ladder_columns` to build one.
+
+    Numeric fields are stored in :mod:`array` arrays of 64 bit integers (doubles on old
+    Pythons without them where a C long is 32 bits). String fields are
+    dictionary encoded: the column holds integer codes into the field's list of
+    :attr:`dictionaries`. Each row is one :class:`LadderRanking`, described by its first player.
+    """
+    #: Columns holding integers
+    NUMERIC_COLUMNS = (
+        'rank', 'previous_rank', 'highest_rank', 'points', 'wins', 'losses', 'join_timestamp',
+        'character_id', 'realm',
+    )
+
+    #: Dictionary encoded columns
+    STRING_COLUMNS = ('region', 'ladder_id', 'league', 'name', 'clan_tag', 'clan_name', 'favorite_race')
+
+    def __init__(self):
+        #: A dict of column name -> array. String columns hold codes into :attr:`dictionaries`.
+        self.columns = dict()
+        for name in self.NUMERIC_COLUMNS:
+            self.columns[name] = array.array(_INT64_TYPECODE)
+        for name in self.STRING_COLUMNS:
+            self.columns[name] = array.array(str('l'))
+
+        #: A dict of string column name -> the list of distinct values the codes refer to
+        self.dictionaries = dict((name, list()) for name in self.STRING_COLUMNS)
+
+        self._codes = dict((name, dict()) for name in self.STRING_COLUMNS)
+
+    def __len__(self):
+        return len(self.columns['points'])
+
+    def add_ladder(self, ladder):
+        """Append a row for each of the ladder's rankings."""
+        for ranking in ladder.rankings:
+            player = ranking.players[0]
+            numbers = (
+                ranking.rank or 0, ranking.previous_rank, ranking.highest_rank, ranking.points,
+                ranking.wins, ranking.losses, ranking.join_timestamp, int(player.id), int(player.realm),
+            )
+            strings = (
+                ladder.region, ladder.id, ladder.league, player.name, player.clan_tag, player.clan_name,
+                ranking.favorite_races[0] if ranking.favorite_races else '',
+            )
+            for name, value in zip(self.NUMERIC_COLUMNS, numbers):
+                self.columns[name].append(value)
+            for name, value in zip(self.STRING_COLUMNS, strings):
+                self.columns[name].append(self._encode(name, value))
+
+    def decode(self, name):
+        """Returns the values of a string column as a list."""
+        dictionary = self.dictionaries[name]
+        return [dictionary[code] for code in self.columns[name]]
+
+    def to_numpy(self):
+        """
+        Returns a dict of column name -> NumPy array. The arrays are copies, so more
+        ladders can still be added to the snapshot. Requires NumPy.
+        """
+        import numpy
+        result = dict()
+        for name in self.NUMERIC_COLUMNS:
+            result[name] = self._export(name).astype(numpy.int64)
+        for name in self.STRING_COLUMNS:
+            result[name] = numpy.array(self.dictionaries[name], dtype=object)[self._export(name)]
+        return result
+
+    def to_pandas(self):
+        """
+        Returns a :class:`pandas.DataFrame` with a column per field. String columns are
+        categoricals built straight from the dictionary encoding. Requires pandas.
+        """
+        import numpy
+        import pandas
+        data = collections.OrderedDict()
+        for name in self.NUMERIC_COLUMNS:
+            data[name] = self._export(name).astype(numpy.int64)
+        for name in self.STRING_COLUMNS:
+            data[name] = pandas.Categorical.from_codes(self._export(name), categories=self.dictionaries[name])
+        return pandas.DataFrame(data)
+
+    def _export(self, name):
+        # Copies the column into a NumPy array. A view of the array's buffer would stop it
+        # from growing for as long as the view is alive.
+        import numpy
+        column = self.columns[name]
+        return numpy.frombuffer(column, dtype=numpy.dtype(column.typecode)).copy()
+
+    def _encode(self, name, value):
+        codes = self._codes[name]
+        if value not in codes:
+            codes[value] = len(codes)
+            self.dictionaries[name].append(value)
+        return codes[value]
+
+
+def ladder_columns(ladders):
+    """Returns :class:`LadderColumns` with the rankings of all the given loaded ladders."""
+    columns = LadderColumns()
+    for ladder in ladders:
+        columns.add_ladder(ladder)
+    return columns
+
+
+class LadderCrawler(object):
+    """
+    Finds and loads every ladder in a region for a season. Starting from seed ladders and
+    profiles, the crawler loads each ladder, follows its players to their profiles, and
+    follows those profiles to their ladders until nothing new turns up. Requests are made
+    through the factory so its cache and :class:`RateLimiter` apply.
+
+    When a checkpoint path is given, progress is saved there as the crawl runs and when it
+    stops, and restored when a crawler is created. A crawl that crashed or was interrupted
+    picks up where it left off without loading finished ladders and profiles again.
+
+    :param factory: The :class:`SC2BnetFactory` to load with.
+    :param region: The region to crawl.
+    :param checkpoint_path: An optional file to save progress to.
+    :param last: When True, crawl the previous season's ladders instead of the current season's.
+    :param workers: The number of requests to make at once.
+    :param checkpoint_every: The number of loads between checkpoint saves.
+    """
+    CHECKPOINT_VERSION = 1
+
+    def __init__(self, factory, region, checkpoint_path=None, last=False, workers=8, checkpoint_every=100):
+        self.factory = factory
+        self.region = region
+        self.checkpoint_path = checkpoint_path
+        self.last = last
+        self.workers = workers
+        self.checkpoint_every = checkpoint_every
+
+        #: The set of ladder ids that were found but have not been loaded yet
+        self.pending_ladders = set()
+
+        #: A dict of ``(bnet_id, realm)`` -> name for profiles found but not loaded yet
+        self.pending_profiles = dict()
+
+        #: The set of ladder ids that have been loaded
+        self.ladders = set()
+
+        #: The set of ``(bnet_id, realm)`` for profiles whose ladders have been loaded
+        self.profiles = set()
+
+        #: A dict of ``('ladder', ladder_id)`` or ``('profile', bnet_id, realm, name)`` -> error
+        #: message for loads that failed. Failed loads aren't retried, see :meth:`retry_failed`.
+        self.failed = dict()
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.load_checkpoint()
+
+    def add_ladder(self, ladder_id):
+        """Seed the crawl with a ladder id."""
+        if ladder_id not in self.ladders:
+            self.pending_ladders.add(ladder_id)
+
+    def add_profile(self, bnet_id, realm, name):
+        """Seed the crawl with a profile."""
+        if (bnet_id, realm) not in self.profiles:
+            self.pending_profiles[(bnet_id, realm)] = name
+
+    def retry_failed(self):
+        """Queue the ladders and profiles that failed to load to be loaded again."""
+        for key in self.failed:
+            if key[0] == 'ladder':
+                self.ladders.discard(key[1])
+                self.add_ladder(key[1])
+            else:
+                self.profiles.discard(key[1:3])
+                self.add_profile(*key[1:])
+        self.failed.clear()
+
+    def crawl(self):
+        """
+        Crawl until no new ladders or profiles are found, yielding a :class:`LoadResult` for
+        each ladder as it is loaded. Found ladders are loaded before found profiles so that
+        results start streaming right away.
+        """
+        loads = 0
+        try:
+            while self.pending_ladders or self.pending_profiles:
+                loading_ladders = bool(self.pending_ladders)
+                if loading_ladders:
+                    keys = [(self.region, ladder_id, self.last) for ladder_id in self.pending_ladders]
+                    results = self.factory.load_ladders(keys, self.workers)
+                else:
+                    keys = [key + (name,) for key, name in self.pending_profiles.items()]
+                    results = self.factory.load_many(self._load_ladder_ids, keys, self.workers)
+
+                try:
+                    for result in results:
+                        if loading_ladders:
+                            self._ladder_done(result)
+                        else:
+                            self._profile_done(result)
+                        loads += 1
+                        if self.checkpoint_path is not None and loads % self.checkpoint_every == 0:
+                            self.save_checkpoint()
+                        if loading_ladders:
+                            yield result
+                finally:
+                    results.close()
+        finally:
+            if self.checkpoint_path is not None:
+                self.save_checkpoint()
+
+    def load_checkpoint(self):
+        """Restore progress from the checkpoint file."""
+        with open(self.checkpoint_path, 'r') as checkpoint_file:
+            data = json.load(checkpoint_file)
+        if data.get('version') != self.CHECKPOINT_VERSION:
+            raise ValueError("Unsupported checkpoint version: {0}".format(data.get('version')))
+        if data['region'] != self.region or data['last'] != self.last:
+            raise ValueError("Checkpoint {0} is for a different crawl".format(self.checkpoint_path))
+
+        self.ladders = set(data['ladders'])
+        self.profiles = set(tuple(key) for key in data['profiles'])
+        self.pending_ladders = set(data['pending_ladders'])
+        self.pending_profiles = dict(((bnet_id, realm), name) for bnet_id, realm, name in data['pending_profiles'])
+        self.failed = dict((tuple(key), message) for key, message in data['failed'])
+
+    def save_checkpoint(self):
+        """Save progress to the checkpoint file. The file is replaced atomically."""
+        data = dict(
+            version=self.CHECKPOINT_VERSION,
+            region=self.region,
+            last=self.last,
+            ladders=list(self.ladders),
+            profiles=list(self.profiles),
+            pending_ladders=list(self.pending_ladders),
+            pending_profiles=[key + (name,) for key, name in self.pending_profiles.items()],
+            failed=list(self.failed.items()),
+        )
+        _atomic_write(self.checkpoint_path, json.dumps(data).encode('utf8'))
+
+    def _load_ladder_ids(self, bnet_id, realm, name):
+        profile = self.factory.get_profile(self.region, bnet_id, realm, name)
+        profile.load_ladders()
+        season = profile.previous_season if self.last else profile.current_season
+        return [ranking.ladder.id for ranking in season.rankings]
+
+    def _ladder_done(self, result):
+        ladder_id = result.key[1]
+        self.pending_ladders.discard(ladder_id)
+        self.ladders.add(ladder_id)
+        if result.error is not None:
+            self.failed[('ladder', ladder_id)] = str(result.error)
+            return
+        for ranking in result.value.rankings:
+            for player in ranking.players:
+                self.add_profile(player.id, player.realm, player.name)
+
+    def _profile_done(self, result):
+        key = tuple(result.key[:2])
+        self.pending_profiles.pop(key, None)
+        self.profiles.add(key)
+        if result.error is not None:
+            self.failed[('profile',) + tuple(result.key)] = str(result.error)
+            return
+        for ladder_id in result.value:
+            self.add_ladder(ladder_id)
+
 
 def main(args=None):
     import argparse
@@ -821,6 +2499,15 @@ def main(args=None):
     ladders_command.add_argument("id")
     ladders_command.add_argument("--last", action="store_true", default=False, help="Only valid for grandmaster ladder rankings")
 
+    batch_command = subparsers.add_parser('batch', help='Load many profiles or ladders as NDJSON')
+    batch_command.set_defaults(func=get_batch)
+    batch_command.set_defaults(command="batch")
+    batch_command.add_argument("type", choices=["profile", "ladder"])
+    batch_command.add_argument("keys", nargs="?", default="-",
+                               help="File with one 'id realm name' profile or 'id' ladder key per line. Defaults to stdin")
+    batch_command.add_argument("--workers", type=int, default=8)
+    batch_command.add_argument("--last", action="store_true", default=False, help="Only valid for grandmaster ladder rankings")
+
     args = parser.parse_args(args)
 
     if args.cache_path is not None:
@@ -830,34 +2517,204 @@ def main(args=None):
         cache = NoCache()
 
     factory = SC2BnetFactory(args.locale, args.public_key, args.private_key, cache)
-    args.func(args, factory)
+    return args.func(args, factory)
 
 
 def get_profile(args, factory):
-    profile = factory.load_profile(args.region, args.id, args.realm, args.name)
+    return _write_records([load_record(factory, args.region, 'profile', (args.id, args.realm, args.name), args.raw)])
 
 
 def get_ladder(args, factory):
-    ladder = factory.load_ladder(args.region, args.id)
+    return _write_records([load_record(factory, args.region, 'ladder', (args.id,), args.raw, args.last)])
+
+
+def get_batch(args, factory):
+    keys_file = sys.stdin if args.keys == '-' else open(args.keys)
+    try:
+        keys = (line.split() for line in keys_file if line.strip())
+        return _write_records(load_records(factory, args.region, args.type, keys, args.raw, args.workers, args.last))
+    finally:
+        if keys_file is not sys.stdin:
+            keys_file.close()
+
+
+def load_record(factory, region, data_type, key, raw=False, last=False):
+    """
+    Loads the profile ``(bnet_id, realm, name)`` or ladder ``(ladder_id,)`` key and returns a
+    json ready record dict of the ``key`` and either its ``data`` or an ``error`` message.
+    Raw records hold the Web API json; otherwise the data is normalized from the loaded
+    :class:`PlayerProfile` or :class:`Ladder`. Normalized profiles hold the portrait,
+    achievements, and rewards as ids so that the catalogs aren't loaded. ``last`` loads last
+    season's grandmaster ladder.
+    """
+    try:
+        return dict(key=list(key), data=_load_record_data(factory, region, data_type, raw, last, *key))
+    except Exception as e:
+        return _error_record(key, e)
+
+
+def load_records(factory, region, data_type, keys, raw=False, workers=8, last=False):
+    """
+    Loads many keys with :meth:`SC2BnetFactory.load_many` and yields a record, as described
+    in :func:`load_record`, for each key as it finishes. Keys are read as workers free up so
+    long streams of keys aren't held in memory.
+    """
+    def load(*key):
+        return _load_record_data(factory, region, data_type, raw, last, *key)
+
+    for result in factory.load_many(load, keys, workers):
+        if result.error is not None:
+            yield _error_record(result.key, result.error)
+        else:
+            yield dict(key=list(result.key), data=result.value)
+
+
+def _load_record_data(factory, region, data_type, raw, last, *key):
+    if data_type == 'profile':
+        bnet_id, realm, name = key
+        if raw:
+            path = "/api/sc2/profile/{0}/{1}/{2}/".format(bnet_id, realm, name)
+            return factory.load_data(HOST_BY_REGION[region], path)
+        profile = factory.get_profile(region, bnet_id, realm, name)
+        profile.load_details(lazy=True)
+        return _profile_record(profile)
+    else:
+        ladder_id, = key
+        if raw:
+            return factory.load_data(HOST_BY_REGION[region], ladder_path(ladder_id, last))
+        return _ladder_record(factory.load_ladder(region, ladder_id, last))
+
+
+def _profile_record(profile):
+    skipped = ('link', 'recent_matches', 'current_season', 'previous_season')
+    record = dict((name, value) for name, value in vars(profile).items() if name[0] != '_' and name not in skipped)
+
+    # Catalog sections are written as ids, from the raw json when they haven't been linked
+    unparsed = dict(profile._unparsed)
+    if 'portrait' in unparsed:
+        record['portrait'] = dict(url=unparsed['portrait']['url'], offset=unparsed['portrait']['offset'])
+    elif profile.portrait is not None:
+        record['portrait'] = dict(url=profile.portrait.url, offset=profile.portrait.offset)
+    else:
+        record['portrait'] = None
+
+    if 'achievements' in unparsed:
+        achievements = [(item['achievementId'], item['completionDate']) for item in unparsed['achievements']]
+    else:
+        achievements = [(achievement.id, date) for achievement, date in profile.achievements.items()]
+    record['achievements'] = [dict(id=item_id, completion_date=date) for item_id, date in sorted(achievements)]
+
+    for name in ('rewards_earned', 'rewards_selected'):
+        record[name] = unparsed[name] if name in unparsed else [reward.id for reward in getattr(profile, name)]
+    return record
+
+
+def _ladder_record(ladder):
+    rankings = list()
+    for ranking in ladder.rankings:
+        rankings.append(dict(
+            rank=ranking.rank, previous_rank=ranking.previous_rank, highest_rank=ranking.highest_rank,
+            points=ranking.points, wins=ranking.wins, losses=ranking.losses, join_timestamp=ranking.join_timestamp,
+            favorite_races=ranking.favorite_races, players=[dict(
+                id=player.id, realm=player.realm, name=player.name, clan_name=player.clan_name, clan_tag=player.clan_tag,
+            ) for player in ranking.players],
+        ))
+    return dict(region=ladder.region, id=ladder.id, rankings=rankings)
+
+
+def _error_record(key, error):
+    record = dict(key=list(key), error=str(error))
+    if isinstance(error, SC2BnetError):
+        record['code'] = error.code
+    return record
+
+
+def _write_records(records):
+    # Writes each record as a line of json as soon as it is ready. Returns an exit status
+    # of 1 when any of the records is an error.
+    status = 0
+    for record in records:
+        sys.stdout.write(json.dumps(record, sort_keys=True) + '\n')
+        sys.stdout.flush()
+        if 'error' in record:
+            status = 1
+    return status
+
+
+def get_factory():
+    """
+    Returns the factory used by the module level functions. Unless :func:`set_factory` was
+    called, it is built on first use from the ``SC2BNET_LOCALE``, ``SC2BNET_PUBLIC_KEY``,
+    ``SC2BNET_PRIVATE_KEY``, ``SC2BNET_CACHE_DIR``, and ``SC2BNET_CACHE_TYPES`` environment
+    variables.
+    """
+    global _factory
+    if _factory is None:
+        with _factory_lock:
+            if _factory is None:
+                cache_dir = os.getenv('SC2BNET_CACHE_DIR', None)
+                cache_types = os.getenv('SC2BNET_CACHE_TYPES', None)
+                if cache_types is not None:
+                    cache_types = cache_types.split(",")
+                cache = FileCache(cache_dir, cache_types=cache_types) if cache_dir else NoCache()
+                _factory = SC2BnetFactory(os.getenv('SC2BNET_LOCALE', None), os.getenv('SC2BNET_PUBLIC_KEY', None),
+                                          os.getenv('SC2BNET_PRIVATE_KEY', None), cache)
+    return _factory
 
 
 def set_factory(factory):
-    module = sys.modules[__name__]
-    module.achievement = factory.achievement
-    module.reward = factory.reward
-    module.icon = factory.icon
-    module.configure = factory.configure
-    module.load_data = factory.load_data
-    module.load_ladder = factory.load_ladder
-    module.load_profile = factory.load_profile
-
-
-locale = os.getenv('SC2BNET_LOCALE', None)
-public_key = os.getenv('SC2BNET_PUBLIC_KEY', None)
-private_key = os.getenv('SC2BNET_PRIVATE_KEY', None)
-cache_dir = os.getenv('SC2BNET_CACHE_DIR', None)
-cache_types = os.getenv('SC2BNET_CACHE_TYPES', None)
-if cache_types is not None:
-    cache_types = cache_types.split(",")
-cache = FileCache(cache_dir, cache_types=cache_types) if cache_dir else NoCache()
-set_factory(SC2BnetFactory(locale, public_key, private_key, cache))
+    """Use the given factory for the module level functions."""
+    global _factory
+    _factory = factory
+
+
+def configure(*args, **kwargs):
+    """Calls :meth:`SC2BnetFactory.configure` on the default factory."""
+    return get_factory().configure(*args, **kwargs)
+
+
+def load_data(host, path, refresh=False, locale=None):
+    """Calls :meth:`SC2BnetFactory.load_data` on the default factory."""
+    return get_factory().load_data(host, path, refresh, locale)
+
+
+def load_ladder(region, ladder_id, last=False):
+    """Calls :meth:`SC2BnetFactory.load_ladder` on the default factory."""
+    return get_factory().load_ladder(region, ladder_id, last)
+
+
+def load_profile(region, bnet_id, realm, name):
+    """Calls :meth:`SC2BnetFactory.load_profile` on the default factory."""
+    return get_factory().load_profile(region, bnet_id, realm, name)
+
+
+class _CatalogProxy(Mapping):
+    # Stands in for one of the default factory's catalogs so that it is only loaded when it
+    # is first used.
+    def __init__(self, name):
+        self._name = name
+
+    def __getitem__(self, key):
+        return getattr(get_factory(), self._name)[key]
+
+    def __iter__(self):
+        return iter(getattr(get_factory(), self._name))
+
+    def __len__(self):
+        return len(getattr(get_factory(), self._name))
+
+    def __repr__(self):
+        return "<{0} catalog of the default factory>".format(self._name)
+
+
+#: The default factory's :attr:`SC2BnetFactory.achievement` catalog, loaded on first use
+achievement = _CatalogProxy('achievement')
+
+#: The default factory's :attr:`SC2BnetFactory.reward` catalog, loaded on first use
+reward = _CatalogProxy('reward')
+
+#: The default factory's :attr:`SC2BnetFactory.icon` catalog, loaded on first use
+icon = _CatalogProxy('icon')
+
+_factory = None
+_factory_lock = threading.Lock()
@@ -1,6 +1,12 @@
 import sys
 import setuptools
 
+install_requires = ['requests']
+if sys.version_info < (2, 7):
+    install_requires += ['argparse', 'unittest2']
+if sys.version_info < (3, 2):
+    install_requires += ['futures']
+
 setuptools.setup(
     license="MIT",
     name="sc2bnet",
@@ -39,5 +45,5 @@ setuptools.setup(
     entry_points={
         'console_scripts': ['sc2bnet = sc2bnet:main']
     },
-    install_requires=['argparse','unittest2','requests']  if float(sys.version[:3]) < 2.7 else ['requests'],
+    install_requires=install_requires,
 )
@@ -8,12 +8,168 @@ if sys.version_info[:2] < (2, 7):
 else:
     import unittest
 
+import json
 import os
 os.environ['SC2BNET_CACHE_DIR'] = 'test_cache'
 os.environ['SC2BNET_CACHE_TYPES'] = 'data,profile,ladder'
 
 import sc2bnet
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+def icon_data(offset, url):
+    return dict(x=0, y=0, w=75, h=75, offset=offset, url=url)
+
+
+def character_data(bnet_id, name):
+    return dict(id=bnet_id, realm=1, displayName=name, clanName='Clan', clanTag='CLN')
+
+
+def ladder_member(bnet_id, name, points, wins=10, losses=5, joined=1375000000):
+    return dict(
+        character=character_data(bnet_id, name), previousRank=0, highestRank=1,
+        wins=wins, losses=losses, points=points, joinTimestamp=joined, favoriteRaceP1='ZERG',
+    )
+
+
+PAYLOADS = {
+    '/api/sc2/data/achievements': dict(
+        achievements=[dict(
+            title='Win One', description='Win a game', achievementId=91, categoryId=5,
+            points=10, icon=icon_data(0, 'http://media/achievements.jpg'),
+        )],
+        categories=[dict(
+            categoryId=4, featuredAchievementId=0, title='Liberty',
+            children=[dict(categoryId=5, featuredAchievementId=91, title='Wins')],
+        )],
+    ),
+    '/api/sc2/data/rewards': dict(
+        portraits=[dict(title='Marine', id=7, achievementId=0, icon=icon_data(3, 'http://media/portraits.jpg'))],
+        skins=[dict(title='Skin', id=8, achievementId=91, icon=icon_data(1, 'http://media/skins.jpg'))],
+    ),
+    '/api/sc2/profile/100/1/Alpha/': dict(
+        clanName='Clan', clanTag='CLN', portrait=dict(url='http://media/portraits.jpg', offset=3),
+        career=dict(primaryRace='ZERG', terranWins=1, protossWins=2, zergWins=3, careerTotalGames=9),
+        season=dict(seasonId=15, totalGamesThisSeason=4),
+        campaign=dict(wol='HARD', hots='BRUTAL'),
+        swarmLevels=dict(
+            level=30,
+            terran=dict(level=10, totalLevelXP=100, currentLevelXP=10),
+            zerg=dict(level=10, totalLevelXP=100, currentLevelXP=10),
+            protoss=dict(level=10, totalLevelXP=100, currentLevelXP=10),
+        ),
+        achievements=dict(
+            points=dict(totalPoints=10, categoryPoints={'4': 10}),
+            achievements=[dict(achievementId=91, completionDate=1375000000)],
+        ),
+        rewards=dict(earned=[7, 8], selected=[7]),
+    ),
+    '/api/sc2/profile/100/1/Alpha/matches': dict(matches=[
+        dict(map='Akilon Wastes', type='SOLO', decision='WIN', speed='FASTER', date=1375000000),
+    ]),
+    '/api/sc2/profile/100/1/Alpha/ladders': dict(
+        currentSeason=[dict(
+            ladder=[dict(
+                ladderId=150982, ladderName='Alpha Tango', division=1, league='MASTER',
+                matchMakingQueue='HOTS_SOLO', wins=10, losses=5, rank=2, showcase=True,
+            )],
+            characters=[character_data(100, 'Alpha')],
+            nonRanked=[],
+        )],
+        previousSeason=[],
+    ),
+    '/api/sc2/ladder/150982': dict(ladderMembers=[
+        ladder_member(100, 'Alpha', 1200),
+        ladder_member(101, 'Bravo', 1500),
+        ladder_member(102, 'Charlie', 900),
+    ]),
+}
+
+NOT_FOUND = dict(status='nok', code=404, message='Sc2 Profile Not Found')
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or dict()
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError("No JSON object could be decoded")
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise sc2bnet.requests.HTTPError("{0} Error".format(self.status_code))
+
+
+class FakeTransport(object):
+    """Serves the canned PAYLOADS and records every url requested."""
+    def __init__(self, payloads=None):
+        self.payloads = payloads or PAYLOADS
+        self.requests = list()
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(url)
+        payload = self.lookup(sc2bnet.urlparse(url).path)
+        if payload is not None:
+            return FakeResponse(200, payload)
+        return FakeResponse(404, NOT_FOUND)
+
+    def lookup(self, path):
+        # Any numbered ladder and profile ids 100-999 are served from the canned data
+        if path in self.payloads:
+            return self.payloads[path]
+        parts = path.strip('/').split('/')
+        if parts[2] == 'ladder' and parts[3].isdigit():
+            return self.payloads.get('/api/sc2/ladder/150982')
+        if parts[2] == 'profile' and 100 <= int(parts[3]) < 1000:
+            return self.payloads.get('/'.join(['/api/sc2/profile/100/1/Alpha'] + parts[6:]) + ('/' if len(parts) == 6 else ''))
+
+
+class SlowTransport(FakeTransport):
+    """A FakeTransport that tracks how many requests are in flight at once."""
+    def __init__(self, delay=0.05):
+        super(SlowTransport, self).__init__()
+        import threading
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def get(self, url, headers=None, timeout=None):
+        import time
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return super(SlowTransport, self).get(url, headers, timeout)
+
+
+class FlakyTransport(FakeTransport):
+    """A FakeTransport that fails with each of the given failures before succeeding."""
+    def __init__(self, failures):
+        super(FlakyTransport, self).__init__()
+        self.failures = list(failures)
+        self.timeouts = list()
+
+    def get(self, url, headers=None, timeout=None):
+        self.timeouts.append(timeout)
+        if self.failures:
+            self.requests.append(url)
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return failure
+        return super(FlakyTransport, self).get(url, headers, timeout)
+
 
 class Tests(unittest.TestCase):
 
@@ -83,6 +239,232 @@ class Tests(unittest.TestCase):
         # clean up
         shutil.rmtree('test_filecache', ignore_errors=True)
 
+    def test_atomic_write(self):
+        import shutil
+        import tempfile
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, True)
+        file_path = os.path.join(path, 'entry.json')
+        sc2bnet._atomic_write(file_path, b'one')
+        with open(file_path, 'rb') as data_file:
+            self.assertEqual(data_file.read(), b'one')
+
+        # A failed write leaves the old file and no temporary files behind
+        original = sc2bnet._replace
+        self.addCleanup(setattr, sc2bnet, '_replace', original)
+
+        def fail(source, target):
+            raise OSError("disk full")
+        sc2bnet._replace = fail
+        self.assertRaises(OSError, sc2bnet._atomic_write, file_path, b'two')
+        self.assertEqual(os.listdir(path), ['entry.json'])
+        with open(file_path, 'rb') as data_file:
+            self.assertEqual(data_file.read(), b'one')
+
+    def test_filecache_compression(self):
+        import gzip
+        import shutil
+        import tempfile
+        path = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(ValueError):
+                sc2bnet.FileCache(path, compression='zip')
+
+            plain = sc2bnet.FileCache(path, cache_types=['ladder'])
+            cache = sc2bnet.FileCache(path, cache_types=['ladder'], compression='gzip')
+            old_key = ('us.battle.net', 'en_US', '/api/sc2/ladder/1')
+            key = ('us.battle.net', 'en_US', '/api/sc2/ladder/2')
+
+            # Uncompressed entries are still read
+            plain[old_key] = dict(ladderMembers=[1])
+            self.assertTrue(old_key in cache)
+            self.assertEqual(cache[old_key], dict(ladderMembers=[1]))
+
+            cache[key] = dict(ladderMembers=[2])
+            file_path = os.path.join(path, 'us.battle.net', 'en_US', 'ladder', '2.json.gz')
+            data_file = gzip.open(file_path, 'rb')
+            try:
+                self.assertEqual(data_file.read(), b'{"ladderMembers": [2]}')
+            finally:
+                data_file.close()
+            self.assertTrue(key in cache)
+            self.assertEqual(cache[key], dict(ladderMembers=[2]))
+            self.assertEqual(plain[key], dict(ladderMembers=[2]))
+
+            for compression in sc2bnet.COMPRESSION:
+                cache = sc2bnet.FileCache(path, cache_types=['ladder'], compression=compression)
+                cache[key] = dict(compression=compression)
+                self.assertEqual(cache[key], dict(compression=compression))
+
+            # Writes replace the entry in every format
+            cache[old_key] = dict(ladderMembers=[3])
+            self.assertEqual(plain[old_key], dict(ladderMembers=[3]))
+            plain[key] = dict(ladderMembers=[4])
+            self.assertEqual(cache[key], dict(ladderMembers=[4]))
+            self.assertEqual([name for name in os.listdir(os.path.dirname(file_path)) if name.startswith('2.')], ['2.json'])
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_filecache_concurrent_writes(self):
+        import shutil
+        import tempfile
+        import threading
+        path = tempfile.mkdtemp()
+        try:
+            errors = list()
+            key = ('us.battle.net', 'en_US', '/api/sc2/ladder/150982')
+            value = dict(ladderMembers=[ladder_member(i, 'Player', i) for i in range(100)])
+
+            def worker():
+                cache = sc2bnet.FileCache(path, cache_types=['ladder'])
+                try:
+                    for i in range(20):
+                        cache[key] = value
+                        self.assertEqual(cache[key], value)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=worker) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(os.listdir(os.path.join(path, 'us.battle.net', 'en_US', 'ladder')), ['150982.json'])
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_filecache_corrupt_entries(self):
+        import shutil
+        import tempfile
+        path = tempfile.mkdtemp()
+        try:
+            for compression in [None, 'gzip']:
+                cache = sc2bnet.FileCache(path, cache_types=['ladder'], compression=compression)
+                key = ('us.battle.net', 'en_US', '/api/sc2/ladder/150982')
+                cache[key] = dict(ladderMembers=[])
+                file_path = cache._path(cache._get_info(key)[1], compression)
+                with open(file_path, 'wb') as data_file:
+                    data_file.write(b'{"ladderMem')
+
+                with self.assertRaises(KeyError):
+                    cache[key]
+                self.assertFalse(os.path.exists(file_path))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_sqlitecache(self):
+        import shutil
+        import tempfile
+        path = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(ValueError):
+                sc2bnet.SQLiteCache(os.path.join(path, 'missing', 'cache.db'))
+
+            cache = sc2bnet.SQLiteCache(os.path.join(path, 'cache.db'), cache_types=['data', 'ladder'])
+            ladder = ('us.battle.net', 'en_US', '/api/sc2/ladder/150982')
+            profile = ('us.battle.net', 'en_US', '/api/sc2/profile/150982/1/alsknflks')
+            rewards = ('us.battle.net', 'en_US', '/api/sc2/data/rewards')
+
+            with self.assertRaises(KeyError):
+                cache[ladder]
+            self.assertFalse(ladder in cache)
+
+            cache[ladder] = dict(hello='world')
+            self.assertTrue(ladder in cache)
+            self.assertEqual(cache[ladder], dict(hello='world'))
+
+            # Profiles should not be cached with this configuration
+            cache[profile] = dict(hello='world')
+            self.assertFalse(profile in cache)
+
+            cache.update({rewards: [1, 2], ladder: dict(hello='again')})
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache[ladder], dict(hello='again'))
+
+            # Entries are shared with other connections to the same file
+            other = sc2bnet.SQLiteCache(os.path.join(path, 'cache.db'), cache_types=['data', 'ladder'])
+            self.assertEqual(other[rewards], [1, 2])
+            other.close()
+
+            self.assertEqual(cache.sweep(3600), 0)
+            self.assertEqual(cache.sweep(-1, data_types=['ladder']), 1)
+            self.assertFalse(ladder in cache)
+            self.assertTrue(rewards in cache)
+            cache.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_sqlitecache_threads(self):
+        import shutil
+        import tempfile
+        import threading
+        path = tempfile.mkdtemp()
+        try:
+            cache = sc2bnet.SQLiteCache(os.path.join(path, 'cache.db'))
+            rewards = ('us.battle.net', 'en_US', '/api/sc2/data/rewards')
+            cache[rewards] = [1, 2]
+            results, done = list(), threading.Event()
+
+            def read():
+                results.append(cache[rewards])
+                done.wait()
+
+            # Every thread reads through a connection of its own
+            threads = [threading.Thread(target=read) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            while len(results) < 4:
+                done.wait(0.01)
+            self.assertEqual(results, [[1, 2]] * 4)
+            self.assertEqual(len(cache._connections), 5)
+            done.set()
+            for thread in threads:
+                thread.join()
+
+            # Connections of threads that exited are closed when the next one is opened
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+            self.assertEqual(len(cache._connections), 2)
+            cache.close()
+            self.assertEqual(cache._connections, [])
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_memorycache(self):
+        backing = sc2bnet.MemoryCache()
+        cache = sc2bnet.MemoryCache(max_entries=2, ttls=dict(ladder=0), cache=backing)
+        profile = ('us.battle.net', 'en_US', '/api/sc2/profile/100/1/Alpha/')
+        rewards = ('us.battle.net', 'en_US', '/api/sc2/data/rewards')
+        achievements = ('us.battle.net', 'en_US', '/api/sc2/data/achievements')
+        ladder = ('us.battle.net', 'en_US', '/api/sc2/ladder/150982')
+
+        with self.assertRaises(KeyError):
+            cache[profile]
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        # Writes go through to the backing cache
+        cache[profile] = 'profile'
+        cache[rewards] = 'rewards'
+        self.assertEqual(cache[profile], 'profile')
+        self.assertEqual(backing[profile], 'profile')
+        self.assertEqual(cache.hits, 1)
+
+        # The least recently used entry is evicted, misses are refilled from the backing cache
+        cache[achievements] = 'achievements'
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache[rewards], 'rewards')
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(cache.evictions, 2)
+
+        # Ladders expire from memory right away with a ttl of 0
+        cache[ladder] = 'ladder'
+        self.assertEqual(cache[ladder], 'ladder')
+        self.assertEqual(cache.expirations, 1)
+        self.assertTrue(ladder in cache)
+
     def test_sc2bnet_error(self):
         """ This should be giving an authentication error, instead getting 500 response."""
         with self.assertRaises(sc2bnet.SC2BnetError):
@@ -92,5 +474,1074 @@ class Tests(unittest.TestCase):
     def test_script(self):
         sc2bnet.main("us --cache-path test_cache --cache-types data,ladder,profile profile 2358439 1 ShadesofGray".split())
 
+
+class ModuleTests(unittest.TestCase):
+
+    def test_lazy_import(self):
+        # Importing doesn't build the default factory, which would fail on the missing cache dir
+        import subprocess
+        env = dict(os.environ, SC2BNET_CACHE_DIR='/missing/sc2bnet/cache')
+        code = ("import sys, sc2bnet; assert sc2bnet._factory is None; "
+                "assert not set(['asyncio', 'sqlite3']) & set(sys.modules); "
+                "repr([sc2bnet.achievement, sc2bnet.reward, sc2bnet.icon]); "
+                "assert sc2bnet._factory is None; sc2bnet.get_factory()")
+        process = subprocess.Popen([sys.executable, '-c', code], env=env, stderr=subprocess.PIPE,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        stderr = process.communicate()[1].decode('utf8')
+        self.assertIn('Cache path does not exist', stderr.strip().splitlines()[-1])
+
+    def test_default_factory(self):
+        original = sc2bnet._factory
+        self.addCleanup(sc2bnet.set_factory, original)
+        transport = FakeTransport()
+        sc2bnet.set_factory(sc2bnet.SC2BnetFactory(transport=transport))
+        ladder = sc2bnet.load_ladder('us', 150982)
+        self.assertEqual(len(ladder.rankings), 3)
+        self.assertEqual(len(transport.requests), 1)
+
+        # Catalogs load on first access
+        self.assertEqual(sc2bnet.achievement[91].title, 'Win One')
+        self.assertEqual(len(transport.requests), 2)
+        self.assertEqual(len(sc2bnet.reward), 2)
+        self.assertIn('http://media/portraits.jpg', sc2bnet.icon)
+
+
+class CatalogIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def factory(self, **options):
+        transport = FakeTransport()
+        return transport, sc2bnet.SC2BnetFactory(transport=transport, catalog_index=sc2bnet.CatalogIndex(self.path), **options)
+
+    def test_index(self):
+        transport, factory = self.factory()
+        self.assertEqual(factory.reward[8].achievement.title, 'Win One')
+        self.assertEqual(len(transport.requests), 2)
+        self.assertEqual(os.listdir(self.path), ['catalog.en_US.idx'])
+
+        # New factories load the linked catalogs from the index
+        transport, factory = self.factory()
+        self.assertEqual(factory.icon['http://media/skins.jpg'][1].title, 'Skin')
+        self.assertTrue(factory.reward[8].achievement is factory.achievement[91])
+        self.assertEqual(factory.achievement[91].category.title, 'Wins')
+        self.assertEqual(transport.requests, [])
+
+    def test_stale_index(self):
+        transport, factory = self.factory()
+        factory.achievement
+        index = sc2bnet.CatalogIndex(self.path).load('en_US')
+
+        # Out of date indexes are checked against the payloads and kept when they match
+        transport, factory = self.factory(ttls=dict(data=0))
+        factory.achievement
+        self.assertEqual(len(transport.requests), 2)
+        reloaded = sc2bnet.CatalogIndex(self.path).load('en_US')
+        self.assertEqual(reloaded['payload_hash'], index['payload_hash'])
+        self.assertTrue(reloaded['built'] >= index['built'])
+
+    def test_unusable_index(self):
+        self.factory()[1].achievement
+        path = os.path.join(self.path, 'catalog.en_US.idx')
+        with open(path, 'r+b') as index_file:
+            index_file.write(b'{"version": 0')
+        self.assertEqual(sc2bnet.CatalogIndex(self.path).load('en_US'), None)
+
+        transport, factory = self.factory()
+        self.assertEqual(factory.achievement[91].title, 'Win One')
+        self.assertEqual(len(transport.requests), 2)
+        self.assertEqual(sc2bnet.CatalogIndex(self.path).load('en_US')['version'], sc2bnet.CatalogIndex.VERSION)
+        self.assertRaises(ValueError, sc2bnet.CatalogIndex, os.path.join(self.path, 'missing'))
+
+
+class LocaleTests(unittest.TestCase):
+
+    class LocalizedTransport(FakeTransport):
+        """Serves catalog titles with the requested locale appended."""
+        def lookup(self, path):
+            payload = super(LocaleTests.LocalizedTransport, self).lookup(path)
+            if path.startswith('/api/sc2/data/'):
+                payload = json.loads(json.dumps(payload).replace('"title": "Win One"', '"title": "Win One ' + self.locale + '"'))
+            return payload
+
+        def get(self, url, headers=None, timeout=None):
+            self.locale = url.split('locale=')[1]
+            return super(LocaleTests.LocalizedTransport, self).get(url, headers, timeout)
+
+    def test_catalogs(self):
+        transport = self.LocalizedTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        english = factory.get_achievements('en_US')
+        french = factory.get_achievements('fr_FR')
+        self.assertTrue(factory.achievement is english)
+        self.assertEqual((english[91].title, french[91].title), ('Win One en_US', 'Win One fr_FR'))
+        self.assertEqual(transport.requests[1], 'https://eu.battle.net/api/sc2/data/achievements?locale=fr_FR')
+
+        # Rewards link to achievements in the same locale
+        self.assertTrue(factory.get_rewards('fr_FR')[8].achievement is french[91])
+        self.assertEqual(factory.get_icons('fr_FR')['http://media/skins.jpg'][1].title, 'Skin')
+
+        # Changing the preferred locale switches catalogs without reloading
+        count = len(transport.requests)
+        factory.configure(preferred_locale='fr_FR')
+        self.assertTrue(factory.achievement is french)
+        self.assertEqual(len(transport.requests), count)
+
+    def test_load_data(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        factory.load_data('us.battle.net', '/api/sc2/ladder/150982', locale='es_MX')
+        factory.load_data('us.battle.net', '/api/sc2/ladder/150982', locale='fr_FR')
+        self.assertEqual(transport.requests, [
+            'https://us.battle.net/api/sc2/ladder/150982?locale=es_MX',
+            'https://us.battle.net/api/sc2/ladder/150982?locale=en_US',
+        ])
+
+
+class RecordTests(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+
+    def test_profile_records(self):
+        keys = [['100', '1', 'Alpha'], ['23589', '1', 'Nobody'], ['101', '1'], ['102', '1', 'Charlie']]
+        records = sorted(sc2bnet.load_records(self.factory, 'us', 'profile', iter(keys), workers=2), key=lambda r: r['key'])
+        self.assertEqual([record['key'] for record in records], sorted(keys))
+        self.assertEqual(records[0]['data']['clan_tag'], 'CLN')
+        self.assertEqual(records[0]['data']['name'], 'Alpha')
+        self.assertIn('unpack', records[1]['error'])
+        self.assertEqual(records[3]['code'], 404)
+
+        # Records are json ready, and normalizing a profile doesn't load the catalogs
+        json.dumps(records)
+        self.assertFalse(any('/data/' in url for url in self.factory.transport.requests))
+        data = records[0]['data']
+        self.assertEqual(data['portrait'], dict(url='http://media/portraits.jpg', offset=3))
+        self.assertEqual(data['achievements'], [dict(id=91, completion_date=1375000000)])
+        self.assertEqual((data['rewards_earned'], data['rewards_selected']), ([7, 8], [7]))
+
+        # Linked profiles give the same sections
+        profile = self.factory.load_profile('us', 100, 1, 'Alpha')
+        profile.portrait, profile.achievements, profile.rewards_earned
+        linked = sc2bnet._profile_record(profile)
+        for name in ('portrait', 'achievements', 'rewards_earned', 'rewards_selected'):
+            self.assertEqual(linked[name], data[name])
+
+    def test_ladder_records(self):
+        record = sc2bnet.load_record(self.factory, 'us', 'ladder', ('150982',))
+        self.assertEqual(record['key'], ['150982'])
+        self.assertEqual(record['data']['rankings'][0]['players'][0]['name'], 'Bravo')
+        self.assertEqual(record['data']['rankings'][0]['rank'], 1)
+
+        record = sc2bnet.load_record(self.factory, 'us', 'ladder', ('150982',), raw=True)
+        self.assertEqual(record['data'], PAYLOADS['/api/sc2/ladder/150982'])
+
+    def test_last_season(self):
+        payloads = dict(PAYLOADS)
+        payloads['/api/sc2/ladder/grandmaster/last'] = payloads['/api/sc2/ladder/150982']
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport(payloads))
+        record = sc2bnet.load_record(factory, 'us', 'ladder', ('grandmaster',), last=True)
+        self.assertEqual(len(record['data']['rankings']), 3)
+        records = list(sc2bnet.load_records(factory, 'us', 'ladder', [['grandmaster']], raw=True, last=True))
+        self.assertEqual(records[0]['data'], payloads['/api/sc2/ladder/grandmaster/last'])
+        self.assertEqual(set(factory.transport.requests), set(['https://us.battle.net/api/sc2/ladder/grandmaster/last?locale=en_US']))
+
+
+class ModelTests(unittest.TestCase):
+
+    def test_compact_models(self):
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+        ladder = factory.load_ladder('us', 150982)
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+        profile.load_matches()
+        profile.load_ladders()
+        for item in [ladder.rankings[0], ladder.rankings[0].players[0], profile.recent_matches[0], profile.portrait,
+                     factory.achievement[91], profile.current_season.rankings[0]]:
+            self.assertFalse(hasattr(item, '__dict__'), type(item).__name__)
+
+    def test_character_ref(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        ladder = factory.load_ladder('us', 150982)
+        character = ladder.rank[2].players[0]
+        self.assertTrue(isinstance(character, sc2bnet.CharacterRef))
+        self.assertEqual((character.region, character.id, character.realm, character.name), ('us', 100, 1, 'Alpha'))
+        self.assertEqual((character.clan_name, character.clan_tag), ('Clan', 'CLN'))
+        self.assertEqual(character._profile, None)
+
+        # The full profile is built on first use, keeping the basic details
+        self.assertEqual(character.link, 'http://us.battle.net/sc2/profile/100/1/Alpha/')
+        self.assertTrue(isinstance(character.profile, sc2bnet.PlayerProfile))
+        self.assertEqual(character.profile.clan_tag, 'CLN')
+        self.assertEqual(len(transport.requests), 1)
+
+        profile = character.load_details()
+        self.assertTrue(profile is character.profile)
+        self.assertEqual(character.terran_level, 10)
+        with self.assertRaises(AttributeError):
+            character.not_an_attribute
+
+
+class LazyProfileTests(unittest.TestCase):
+
+    def test_lazy_sections(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport, lazy_profiles=True)
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+        self.assertEqual(profile.terran_level, 10)
+        self.assertEqual(profile.total_achievement_points, 10)
+        self.assertEqual(len(transport.requests), 1)
+
+        self.assertEqual([reward.id for reward in profile.rewards_selected], [7])
+        self.assertEqual(len(transport.requests), 3)
+        self.assertEqual([achievement.id for achievement in profile.achievements], [91])
+        self.assertTrue(profile.portrait is factory.icon['http://media/portraits.jpg'][3])
+        self.assertEqual(len(transport.requests), 3)
+
+        # Assigned values replace anything not yet parsed
+        profile.load_details()
+        profile.rewards_earned = []
+        self.assertEqual(profile.rewards_earned, [])
+
+    def test_failed_link(self):
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport(), lazy_profiles=True,
+                                         retry=sc2bnet.RetryPolicy(max_attempts=1))
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+
+        # A catalog load that fails leaves the section to be linked on the next access
+        factory.configure(transport=FlakyTransport([sc2bnet.requests.ConnectionError()]))
+        self.assertRaises(sc2bnet.requests.ConnectionError, getattr, profile, 'achievements')
+        self.assertEqual([achievement.id for achievement in profile.achievements], [91])
+        self.assertEqual(sorted(profile._unparsed), ['portrait', 'rewards_earned', 'rewards_selected'])
+
+    def test_concurrent_access(self):
+        factory = sc2bnet.SC2BnetFactory(transport=SlowTransport(delay=0.05), lazy_profiles=True)
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+        executor = sc2bnet.futures.ThreadPoolExecutor(4)
+        rewards = list(executor.map(lambda i: profile.rewards_earned, range(4)))
+        executor.shutdown()
+        self.assertEqual([[reward.id for reward in earned] for earned in rewards], [[7, 8]] * 4)
+
+    def test_eager_by_default(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+        self.assertEqual(len(transport.requests), 3)
+        self.assertEqual(profile._unparsed, dict())
+        self.assertEqual([reward.id for reward in profile.rewards_earned], [7, 8])
+
+        # The setting can be overridden per call
+        profile = factory.get_profile('us', 101, 1, 'Alpha')
+        profile.load_details(lazy=True)
+        self.assertEqual(len(profile._unparsed), 4)
+
+
+class LadderColumnsTests(unittest.TestCase):
+
+    def setUp(self):
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+        self.ladders = [factory.load_ladder('us', 150982), factory.load_ladder('eu', 150983)]
+        self.columns = sc2bnet.ladder_columns(self.ladders)
+
+    def test_columns(self):
+        columns = self.columns
+        self.assertEqual(len(columns), 6)
+        self.assertEqual(list(columns.columns['points']), [1500, 1200, 900] * 2)
+        self.assertEqual(list(columns.columns['rank']), [1, 2, 3] * 2)
+        self.assertEqual(list(columns.columns['character_id']), [101, 100, 102] * 2)
+        self.assertEqual(list(columns.columns['join_timestamp']), [1375000000] * 6)
+
+        # Strings are dictionary encoded
+        self.assertEqual(columns.dictionaries['region'], ['us', 'eu'])
+        self.assertEqual(list(columns.columns['region']), [0, 0, 0, 1, 1, 1])
+        self.assertEqual(columns.decode('name'), ['Bravo', 'Alpha', 'Charlie'] * 2)
+        self.assertEqual(columns.decode('ladder_id'), [150982] * 3 + [150983] * 3)
+        self.assertEqual(columns.dictionaries['favorite_race'], ['ZERG'])
+
+        self.assertEqual(list(self.ladders[0].to_columns().columns['wins']), [10, 10, 10])
+
+    def test_fallback_typecode(self):
+        # Pythons before 3.3 have no 'q' arrays and may store the numbers as doubles instead
+        original = sc2bnet._INT64_TYPECODE
+        self.addCleanup(setattr, sc2bnet, '_INT64_TYPECODE', original)
+        sc2bnet._INT64_TYPECODE = str('d')
+        columns = sc2bnet.ladder_columns(self.ladders)
+        self.assertEqual(list(columns.columns['join_timestamp']), [1375000000] * 6)
+        self.assertEqual(columns.decode('name'), ['Bravo', 'Alpha', 'Charlie'] * 2)
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        arrays = self.columns.to_numpy()
+        self.assertEqual(arrays['points'].sum(), 7200)
+        self.assertEqual(list(arrays['region']), ['us'] * 3 + ['eu'] * 3)
+
+        # Exported arrays are copies, so the snapshot can still grow
+        self.columns.add_ladder(self.ladders[0])
+        self.assertEqual(len(self.columns), 9)
+        self.assertEqual(len(arrays['points']), 6)
+
+    def test_pandas(self):
+        try:
+            import pandas
+        except ImportError:
+            self.skipTest("pandas is not installed")
+        frame = self.columns.to_pandas()
+        self.assertEqual(frame.groupby('region', observed=True)['points'].sum().to_dict(), dict(us=3600, eu=3600))
+        self.columns.add_ladder(self.ladders[0])
+        self.assertEqual((len(self.columns), len(frame)), (9, 6))
+
+
+class LadderDiffTests(unittest.TestCase):
+
+    def test_reload(self):
+        payloads = dict(PAYLOADS)
+        transport = FakeTransport(payloads)
+        factory = sc2bnet.SC2BnetFactory(transport=transport, cache=sc2bnet.MemoryCache())
+        ladder = factory.load_ladder('us', 150982)
+        self.assertEqual(ladder.reload(), ([], [], []))
+
+        # Alpha won a game, Charlie left, and Delta joined
+        payloads['/api/sc2/ladder/150982'] = dict(ladderMembers=[
+            ladder_member(100, 'Alpha', 1220, wins=11),
+            ladder_member(101, 'Bravo', 1500),
+            ladder_member(103, 'Delta', 1000),
+        ])
+        diff = ladder.reload()
+        self.assertEqual([ranking.key for ranking in diff.added], [((103, 1),)])
+        self.assertEqual([ranking.players[0].name for ranking in diff.removed], ['Charlie'])
+        self.assertEqual(len(diff.changed), 1)
+        old, new = diff.changed[0]
+        self.assertEqual((old.wins, new.wins, old.points, new.points), (10, 11, 1200, 1220))
+        self.assertEqual(sorted(ladder.rank), [1, 2, 3])
+
+    def test_diff(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        old = factory.load_ladder('us', 150982)
+        new = factory.load_ladder('us', 150982)
+        new.rankings[0].losses += 1
+        diff = new.diff(old)
+        self.assertEqual([pair[1].players[0].name for pair in diff.changed], ['Bravo'])
+        self.assertEqual(sc2bnet.diff_rankings(old.rankings, new.rankings, fields=('wins',)), ([], [], []))
+
+    def test_snapshot(self):
+        import pickle
+        payloads = dict(PAYLOADS)
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport(payloads), cache=sc2bnet.MemoryCache())
+        ladder = factory.load_ladder('us', 150982)
+        snapshot = pickle.loads(pickle.dumps(ladder.snapshot()))
+        self.assertEqual(snapshot[((101, 1),)], (1, 1500, 10, 5))
+        self.assertEqual(ladder.diff(snapshot), ([], [], []))
+
+        payloads['/api/sc2/ladder/150982'] = dict(ladderMembers=[
+            ladder_member(100, 'Alpha', 1220, wins=11),
+            ladder_member(101, 'Bravo', 1500),
+        ])
+        ladder.load_details(refresh=True)
+        diff = sc2bnet.diff_rankings(snapshot, ladder.rankings)
+        self.assertEqual(diff.removed, [sc2bnet.RankingSnapshot(((102, 1),), 3, 900, 10, 5)])
+        old, new = diff.changed[0]
+        self.assertEqual((old.wins, new.wins, old.points, new.points), (10, 11, 1200, 1220))
+
+
+class RankingTests(unittest.TestCase):
+
+    def setUp(self):
+        payloads = dict(PAYLOADS)
+        payloads['/api/sc2/ladder/1'] = dict(ladderMembers=[
+            ladder_member(100, 'Alpha', 1200, wins=10, joined=1375000005),
+            ladder_member(101, 'Bravo', 1200, wins=12),
+            ladder_member(102, 'Charlie', 1200, wins=10, joined=1375000001),
+            ladder_member(103, 'Delta', 1300),
+        ])
+        payloads['/api/sc2/ladder/2'] = dict(ladderMembers=[
+            ladder_member(104, 'Echo', 1250),
+            ladder_member(105, 'Foxtrot', 1100),
+        ])
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport(payloads))
+        self.ladders = [factory.load_ladder('us', 1), factory.load_ladder('us', 2)]
+
+    def names(self, rankings):
+        return [ranking.players[0].name for ranking in rankings]
+
+    def test_ties(self):
+        # Points, then wins, then the earliest join time
+        ladder = self.ladders[0]
+        self.assertEqual(self.names(ladder.rankings), ['Delta', 'Bravo', 'Charlie', 'Alpha'])
+        self.assertEqual(self.names(ladder.rank[r] for r in range(1, 5)), ['Delta', 'Bravo', 'Charlie', 'Alpha'])
+
+    def test_top(self):
+        rankings = list(reversed(self.ladders[0].rankings))
+        self.assertEqual(self.names(sc2bnet.top_rankings(rankings, 2)), ['Delta', 'Bravo'])
+
+    def test_merge(self):
+        merged = list(sc2bnet.merge_rankings(self.ladders))
+        self.assertEqual([rank for rank, ranking in merged], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.names(r for rank, r in merged), ['Delta', 'Echo', 'Bravo', 'Charlie', 'Alpha', 'Foxtrot'])
+        self.assertEqual(self.names(r for rank, r in sc2bnet.merge_rankings(self.ladders, 2)), ['Delta', 'Echo'])
+
+
+class CrawlerTests(unittest.TestCase):
+
+    def setUp(self):
+        # Bravo also plays on a second ladder, which has the same players
+        payloads = dict(PAYLOADS)
+        ladders = dict(payloads['/api/sc2/profile/100/1/Alpha/ladders'])
+        ladders['currentSeason'] = [dict(ladders['currentSeason'][0], ladder=[
+            dict(ladders['currentSeason'][0]['ladder'][0], ladderId=150983),
+        ])]
+        payloads['/api/sc2/profile/101/1/Bravo/ladders'] = ladders
+        self.transport = FakeTransport(payloads)
+        self.factory = sc2bnet.SC2BnetFactory(transport=self.transport)
+
+        import shutil
+        import tempfile
+        self.path = os.path.join(tempfile.mkdtemp(), 'crawl.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.path))
+
+    def test_crawl(self):
+        crawler = sc2bnet.LadderCrawler(self.factory, 'us', workers=2)
+        crawler.add_profile(100, 1, 'Alpha')
+        results = list(crawler.crawl())
+        self.assertEqual(sorted(result.key[1] for result in results), [150982, 150983])
+        self.assertEqual(crawler.ladders, set([150982, 150983]))
+        self.assertEqual(crawler.profiles, set([(100, 1), (101, 1), (102, 1)]))
+        self.assertEqual(len(self.transport.requests), 5)
+
+    def test_failures(self):
+        crawler = sc2bnet.LadderCrawler(self.factory, 'us')
+        crawler.add_profile(23589, 1, 'Nobody')
+        self.assertEqual(list(crawler.crawl()), [])
+        self.assertEqual(list(crawler.failed), [('profile', 23589, 1, 'Nobody')])
+
+        crawler.retry_failed()
+        self.assertEqual(crawler.pending_profiles, {(23589, 1): 'Nobody'})
+
+    def test_resume(self):
+        crawler = sc2bnet.LadderCrawler(self.factory, 'us', checkpoint_path=self.path)
+        crawler.add_ladder(150982)
+        for result in crawler.crawl():
+            break
+        self.assertEqual(len(self.transport.requests), 1)
+
+        # The rerun picks up at the profiles found on the first ladder
+        crawler = sc2bnet.LadderCrawler(self.factory, 'us', checkpoint_path=self.path)
+        crawler.add_ladder(150982)
+        self.assertEqual(len(crawler.pending_profiles), 3)
+        self.assertEqual(crawler.pending_ladders, set())
+        results = list(crawler.crawl())
+        self.assertEqual([result.key[1] for result in results], [150983])
+        self.assertEqual(self.transport.requests.count('https://us.battle.net/api/sc2/ladder/150982?locale=en_US'), 1)
+
+        # Nothing is left to do
+        crawler = sc2bnet.LadderCrawler(self.factory, 'us', checkpoint_path=self.path)
+        self.assertEqual(list(crawler.crawl()), [])
+        self.assertRaises(ValueError, sc2bnet.LadderCrawler, self.factory, 'eu', checkpoint_path=self.path)
+
+
+class IdentityMapTests(unittest.TestCase):
+
+    def test_shared_objects(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport, identity_map=True)
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+        self.assertTrue(factory.load_profile('us', '100', '1', 'Alpha') is profile)
+
+        # Ladder members refer to the already loaded profile
+        ladder = factory.load_ladder('us', 150982)
+        self.assertTrue(ladder.rank[2].players[0].profile is profile)
+        self.assertEqual(ladder.rank[2].players[0].terran_level, 10)
+
+        # Team rankings share the loaded ladder
+        profile.load_ladders()
+        self.assertTrue(profile.current_season.rankings[0].ladder is ladder)
+        self.assertTrue(profile.current_season.teams[0].members[0].profile is profile)
+
+    def test_unused_objects_are_released(self):
+        import gc
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport(), identity_map=True)
+        ladder = factory.load_ladder('us', 150982)
+        self.assertEqual(len(factory._ladders), 1)
+        del ladder
+        gc.collect()
+        self.assertEqual(len(factory._ladders), 0)
+
+    def test_disabled_by_default(self):
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+        self.assertFalse(factory.load_ladder('us', 150982) is factory.load_ladder('us', 150982))
+        self.assertFalse(factory.get_profile('us', 100, 1, 'Alpha') is factory.get_profile('us', 100, 1, 'Alpha'))
+
+
+class TransportTests(unittest.TestCase):
+
+    def setUp(self):
+        from threading import Thread
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+
+        connections = self.connections = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                connections.add(self.client_address)
+                body = b'{"status": "ok"}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}/api/sc2/data/rewards'.format(self.server.server_address[1])
+        Thread(target=self.server.serve_forever).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive_reuses_connections(self):
+        transport = sc2bnet.SessionTransport()
+        for i in range(20):
+            self.assertEqual(transport.get(self.url).json(), dict(status='ok'))
+        transport.close()
+        self.assertEqual(len(self.connections), 1)
+
+    def test_keep_alive_disabled(self):
+        transport = sc2bnet.SessionTransport(keep_alive=False)
+        for i in range(5):
+            transport.get(self.url)
+        transport.close()
+        self.assertEqual(len(self.connections), 5)
+
+    def test_reserve(self):
+        transport = sc2bnet.SessionTransport(pool_size=2)
+        session = transport.session('127.0.0.1')
+        transport.reserve(1)
+        self.assertEqual(transport.pool_size, 2)
+        transport.reserve(32)
+        self.assertEqual(transport.pool_size, 32)
+        self.assertEqual(session.get_adapter(self.url)._pool_maxsize, 32)
+        self.assertEqual(transport.get(self.url).json(), dict(status='ok'))
+        transport.close()
+
+    def test_custom_transport(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        profile = factory.load_profile('us', 100, 1, 'Alpha')
+        self.assertEqual(transport.requests[0], 'https://us.battle.net/api/sc2/profile/100/1/Alpha/?locale=en_US')
+        self.assertEqual(profile.portrait.offset, 3)
+        self.assertEqual([reward.id for reward in profile.rewards_earned], [7, 8])
+
+
+class BulkTests(unittest.TestCase):
+
+    def test_load_profiles(self):
+        transport = SlowTransport(delay=0.01)
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        keys = [('us', 100 + i, 1, 'Alpha') for i in range(20)]
+        keys.insert(10, ('us', 23589, 1, 'Nobody'))
+        results = list(factory.load_profiles(keys, workers=4))
+
+        self.assertEqual(len(results), 21)
+        errors = [result for result in results if result.error is not None]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].key, ('us', 23589, 1, 'Nobody'))
+        self.assertEqual(errors[0].error.code, 404)
+        self.assertTrue(all(result.value.clan_tag == 'CLN' for result in results if result.error is None))
+        self.assertEqual(transport.max_active, 4)
+
+    def test_load_ladders_streams_keys(self):
+        consumed = list()
+
+        def keys():
+            for i in range(100):
+                consumed.append(i)
+                yield ('us', 150982)
+
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+        results = factory.load_ladders(keys(), workers=2)
+        first = next(results)
+        self.assertEqual(first.value.rank[1].points, 1500)
+        self.assertTrue(len(consumed) < 10)
+        self.assertEqual(len(list(results)), 99)
+
+    def test_workers_grow_pool(self):
+        factory = sc2bnet.SC2BnetFactory()
+        results = factory.load_many(lambda i: i, [(i,) for i in range(3)], workers=24)
+        self.assertEqual(sorted(result.value for result in results), [0, 1, 2])
+        self.assertEqual(factory.transport.pool_size, 24)
+
+
+class RegionTests(unittest.TestCase):
+
+    def test_load_regions(self):
+        transport = SlowTransport(delay=0.1)
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        import time
+        start = time.time()
+        results, errors = factory.load_regions(factory.load_ladder, (150982,))
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual(sorted(results), sorted(sc2bnet.HOST_BY_REGION))
+        self.assertEqual(errors, dict())
+        self.assertEqual(results['kr'].region, 'kr')
+        self.assertEqual(transport.max_active, 6)
+
+    def test_partial_results(self):
+        import time
+
+        def loader(region, delay):
+            if region == 'kr':
+                raise sc2bnet.SC2BnetError(NOT_FOUND)
+            elif region == 'eu':
+                time.sleep(delay)
+            return region
+
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+        start = time.time()
+        results, errors = factory.load_regions(loader, (1,), ['us', 'eu', 'kr'], timeout=dict(eu=0.05))
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual(results, dict(us='us'))
+        self.assertEqual(errors['kr'].code, 404)
+        self.assertTrue(isinstance(errors['eu'], sc2bnet.futures.TimeoutError))
+
+    def test_timeout_applies_to_requests(self):
+        import threading
+        import time
+        import requests
+        finished = threading.Event()
+
+        class HangingTransport(FakeTransport):
+            # Holds each request for its read timeout and then times out
+            def get(self, url, headers=None, timeout=None):
+                self.requests.append(timeout)
+                time.sleep(timeout[1])
+                raise requests.Timeout(url)
+
+        def loader(region):
+            try:
+                return factory.load_ladder(region, 150982)
+            finally:
+                finished.set()
+
+        transport = HangingTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport, retry=sc2bnet.RetryPolicy(max_attempts=5, backoff=0.01))
+        results, errors = factory.load_regions(loader, regions=['us'], timeout=0.2)
+        self.assertTrue(isinstance(errors['us'], sc2bnet.futures.TimeoutError))
+        self.assertTrue(finished.wait(1))
+        self.assertTrue(all(max(timeout) <= 0.2 for timeout in transport.requests))
+
+    def test_no_regions(self):
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport())
+        self.assertEqual(factory.load_regions(factory.load_ladder, (150982,), regions=[]), ({}, {}))
+        self.assertEqual(factory.transport.requests, [])
+
+    def test_host_concurrency(self):
+        def max_active(region, **options):
+            transport = SlowTransport(delay=0.02)
+            factory = sc2bnet.SC2BnetFactory(transport=transport, **options)
+            results = list(factory.load_ladders([(region, 150982 + i) for i in range(8)], workers=8))
+            self.assertTrue(all(result.error is None for result in results))
+            return transport.max_active
+
+        self.assertEqual(max_active('us', host_concurrency={'us.battle.net': 2}), 2)
+        self.assertTrue(max_active('eu', host_concurrency={'us.battle.net': 2}) > 2)
+        self.assertEqual(max_active('eu', host_concurrency=3), 3)
+
+
+class SingleFlightTests(unittest.TestCase):
+
+    def run_threads(self, count, target):
+        import threading
+        results, errors = list(), list()
+
+        def worker():
+            try:
+                results.append(target())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_duplicate_requests_are_coalesced(self):
+        transport = SlowTransport(delay=0.2)
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        results, errors = self.run_threads(10, lambda: factory.load_data('us.battle.net', '/api/sc2/ladder/150982'))
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(len(transport.requests), 1)
+
+        # Once the request is done, new requests go out again
+        factory.load_data('us.battle.net', '/api/sc2/ladder/150982')
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_errors_are_shared(self):
+        transport = SlowTransport(delay=0.2)
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        results, errors = self.run_threads(5, lambda: factory.load_profile('us', 23589, 1, 'Nobody'))
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(isinstance(error, sc2bnet.SC2BnetError) for error in errors))
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_catalogs_load_once(self):
+        transport = SlowTransport(delay=0.1)
+        factory = sc2bnet.SC2BnetFactory(transport=transport)
+        results, errors = self.run_threads(10, lambda: factory.load_profile('us', 100, 1, 'Alpha'))
+        self.assertEqual(errors, [])
+        self.assertTrue(all(profile.portrait is results[0].portrait for profile in results))
+        self.assertEqual(len([url for url in transport.requests if '/data/' in url]), 2)
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_nonblocking_per_key(self):
+        limiter = sc2bnet.RateLimiter(per_second=3, block=False)
+        factory = sc2bnet.SC2BnetFactory(public_key='key', private_key='secret', transport=FakeTransport(),
+                                         rate_limiter=limiter)
+        for i in range(3):
+            factory.load_data('us.battle.net', '/api/sc2/ladder/150982')
+        with self.assertRaises(sc2bnet.RateLimitExceeded) as context:
+            factory.load_data('eu.battle.net', '/api/sc2/ladder/150982')
+        self.assertEqual(context.exception.scope, 'key')
+        self.assertTrue(0 < context.exception.wait <= 1)
+
+        self.assertEqual(limiter.counts('key'), dict(second=3, hour=3, total=3))
+        self.assertEqual(limiter.counts('us.battle.net')['total'], 3)
+        self.assertEqual(limiter.counts('eu.battle.net')['total'], 0)
+
+    def test_host_limits(self):
+        limiter = sc2bnet.RateLimiter(per_second=100, limits={'kr.battle.net': (1, None)}, block=False)
+        limiter.acquire('kr.battle.net')
+        limiter.acquire('us.battle.net')
+        with self.assertRaises(sc2bnet.RateLimitExceeded) as context:
+            limiter.acquire('kr.battle.net')
+        self.assertEqual(context.exception.scope, 'kr.battle.net')
+
+    def test_fractional_rate(self):
+        limiter = sc2bnet.RateLimiter(per_second=0.5, block=False)
+        limiter.acquire('us.battle.net')
+        with self.assertRaises(sc2bnet.RateLimitExceeded) as context:
+            limiter.acquire('us.battle.net')
+        self.assertTrue(1.9 < context.exception.wait <= 2)
+
+    def test_blocking_across_threads(self):
+        import time
+        limiter = sc2bnet.RateLimiter(per_second=20)
+        factory = sc2bnet.SC2BnetFactory(transport=FakeTransport(), rate_limiter=limiter)
+        start = time.time()
+        keys = [('us', i) for i in range(30)]
+        results = list(factory.load_ladders(keys, workers=6))
+        self.assertTrue(all(result.error is None for result in results))
+        # 20 requests fit in the initial burst, the last 10 need another half second
+        self.assertTrue(time.time() - start >= 0.45)
+        self.assertEqual(limiter.counts(None)['total'], 30)
+
+
+class FreshnessTests(unittest.TestCase):
+    key = ('us.battle.net', 'en_US', '/api/sc2/ladder/150982')
+
+    def age(self, cache, seconds):
+        entry = cache[self.key]
+        entry['fetched'] -= seconds
+        cache[self.key] = entry
+
+    def test_stale_entries_are_refetched(self):
+        import time
+        transport, cache = FakeTransport(), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport, ttls=dict(ladder=300))
+        factory.load_data(*self.key[::2])
+        self.assertTrue(abs(cache[self.key]['fetched'] - time.time()) < 5)
+
+        factory.load_data(*self.key[::2])
+        self.assertEqual(len(transport.requests), 1)
+
+        self.age(cache, 301)
+        factory.load_data(*self.key[::2])
+        self.assertEqual(len(transport.requests), 2)
+
+        # Data types without a ttl never go stale
+        factory.configure(ttls=dict(profile=300))
+        self.age(cache, 10**6)
+        factory.load_data(*self.key[::2])
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_legacy_entries(self):
+        transport, cache = FakeTransport(), sc2bnet.MemoryCache()
+        cache[self.key] = dict(ladderMembers=[])
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport)
+        self.assertEqual(factory.load_data(*self.key[::2]), dict(ladderMembers=[]))
+
+        # Without a fetch time they are stale as soon as a ttl applies
+        factory.configure(ttls=dict(ladder=300))
+        self.assertEqual(len(factory.load_data(*self.key[::2])['ladderMembers']), 3)
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_stale_while_revalidate(self):
+        import time
+        transport, cache = SlowTransport(delay=0.1), sc2bnet.MemoryCache()
+        cache[self.key] = dict(_entry=1, fetched=0, data=dict(ladderMembers=[]))
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport, ttls=dict(ladder=300),
+                                         stale_while_revalidate=True)
+
+        # The stale data comes back right away, and only one refresh is started
+        self.assertEqual(factory.load_data(*self.key[::2]), dict(ladderMembers=[]))
+        self.assertEqual(factory.load_data(*self.key[::2]), dict(ladderMembers=[]))
+        for i in range(50):
+            if cache[self.key]['fetched'] != 0:
+                break
+            time.sleep(0.05)
+        self.assertEqual(len(factory.load_data(*self.key[::2])['ladderMembers']), 3)
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_bounded_revalidation(self):
+        import time
+        transport, cache = SlowTransport(delay=0.05), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport, ttls=dict(ladder=300),
+                                         stale_while_revalidate=True)
+        keys = [('us.battle.net', 'en_US', '/api/sc2/ladder/{0}'.format(i)) for i in range(20)]
+        for key in keys:
+            cache[key] = dict(_entry=1, fetched=0, data=dict(ladderMembers=[]))
+            factory.load_data(*key[::2])
+        for i in range(100):
+            if len(transport.requests) == 20:
+                break
+            time.sleep(0.05)
+        factory.close()
+        self.assertEqual(len(transport.requests), 20)
+        self.assertEqual(transport.max_active, factory.revalidate_workers)
+
+    def test_close(self):
+        transport, cache = SlowTransport(delay=0.2), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport, ttls=dict(ladder=300),
+                                         stale_while_revalidate=True)
+        keys = [('us.battle.net', 'en_US', '/api/sc2/ladder/{0}'.format(i)) for i in range(20)]
+        for key in keys:
+            cache[key] = dict(_entry=1, fetched=0, data=dict(ladderMembers=[]))
+        for key in keys[:10]:
+            factory.load_data(*key[::2])
+
+        # Queued revalidations are dropped, and none are started once closed
+        factory.close()
+        self.assertTrue(len(transport.requests) <= factory.revalidate_workers)
+        self.assertEqual(factory.load_data(*keys[10][::2]), dict(ladderMembers=[]))
+        self.assertTrue(len(transport.requests) <= factory.revalidate_workers)
+
+
+class ConditionalTransport(FakeTransport):
+    """A FakeTransport that supports conditional requests using a fixed ETag."""
+    def __init__(self, etag='"v1"', last_modified='Thu, 01 Aug 2013 00:00:00 GMT'):
+        super(ConditionalTransport, self).__init__()
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = list()
+
+    def get(self, url, headers=None, timeout=None):
+        self.headers.append(dict(headers or {}))
+        if (headers or {}).get('If-None-Match') == self.etag:
+            self.requests.append(url)
+            return FakeResponse(304, None)
+        response = super(ConditionalTransport, self).get(url, headers, timeout)
+        response.headers = {'ETag': self.etag, 'Last-Modified': self.last_modified}
+        return response
+
+
+class ConditionalRequestTests(unittest.TestCase):
+
+    def test_revalidation(self):
+        transport, cache = ConditionalTransport(), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport)
+        key = ('us.battle.net', 'en_US', '/api/sc2/data/rewards')
+        data = factory.load_data('us.battle.net', '/api/sc2/data/rewards')
+        self.assertEqual(cache[key]['etag'], '"v1"')
+        self.assertEqual(cache[key]['last_modified'], 'Thu, 01 Aug 2013 00:00:00 GMT')
+        self.assertFalse('If-None-Match' in transport.headers[0])
+
+        # A 304 renews the cached entry
+        entry = cache[key]
+        entry['fetched'] = 0
+        cache[key] = entry
+        self.assertEqual(factory.load_data('us.battle.net', '/api/sc2/data/rewards', refresh=True), data)
+        self.assertEqual(transport.headers[1]['If-None-Match'], '"v1"')
+        self.assertEqual(transport.headers[1]['If-Modified-Since'], 'Thu, 01 Aug 2013 00:00:00 GMT')
+        self.assertTrue(cache[key]['fetched'] > 0)
+        self.assertEqual(cache[key]['etag'], '"v1"')
+
+        # Changed data is downloaded and replaces the entry
+        transport.etag = '"v2"'
+        factory.load_data('us.battle.net', '/api/sc2/data/rewards', refresh=True)
+        self.assertEqual(cache[key]['etag'], '"v2"')
+        self.assertEqual(len(transport.requests), 3)
+
+    def test_no_validators(self):
+        transport, cache = FakeTransport(), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport)
+        factory.load_data('us.battle.net', '/api/sc2/data/rewards')
+        factory.load_data('us.battle.net', '/api/sc2/data/rewards', refresh=True)
+        self.assertEqual(len(transport.requests), 2)
+
+
+class NegativeCacheTests(unittest.TestCase):
+    key = ('us.battle.net', 'en_US', '/api/sc2/profile/23589/1/Nobody/')
+
+    def test_errors_are_cached(self):
+        transport, cache = FakeTransport(), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport, error_ttl=600)
+        for i in range(3):
+            with self.assertRaises(sc2bnet.SC2BnetError) as context:
+                factory.load_profile('us', 23589, 1, 'Nobody')
+            self.assertEqual(context.exception.code, 404)
+            self.assertEqual(context.exception.message, 'Sc2 Profile Not Found')
+        self.assertEqual(len([url for url in transport.requests if '23589' in url]), 1)
+
+        # Once the error ttl runs out the profile is requested again
+        entry = cache[self.key]
+        entry['fetched'] -= 601
+        cache[self.key] = entry
+        with self.assertRaises(sc2bnet.SC2BnetError):
+            factory.load_profile('us', 23589, 1, 'Nobody')
+        self.assertEqual(len([url for url in transport.requests if '23589' in url]), 2)
+
+    def test_disabled_by_default(self):
+        transport, cache = FakeTransport(), sc2bnet.MemoryCache()
+        factory = sc2bnet.SC2BnetFactory(cache=cache, transport=transport)
+        for i in range(2):
+            with self.assertRaises(sc2bnet.SC2BnetError):
+                factory.load_data(*self.key[::2])
+        self.assertFalse(self.key in cache)
+        self.assertEqual(len(transport.requests), 2)
+
+        # Only the configured error codes are cached
+        factory.configure(error_ttl=600, error_codes=(500,))
+        with self.assertRaises(sc2bnet.SC2BnetError):
+            factory.load_data(*self.key[::2])
+        self.assertFalse(self.key in cache)
+
+
+class RetryTests(unittest.TestCase):
+
+    def test_retries_transient_failures(self):
+        transport = FlakyTransport([
+            FakeResponse(503, None),
+            sc2bnet.requests.ConnectionError("connection reset"),
+        ])
+        factory = sc2bnet.SC2BnetFactory(transport=transport, timeout=(1, 2), retry=sc2bnet.RetryPolicy(backoff=0))
+        data = factory.load_data('us.battle.net', '/api/sc2/ladder/150982')
+        self.assertEqual(len(data['ladderMembers']), 3)
+        self.assertEqual(len(transport.requests), 3)
+        self.assertEqual(transport.timeouts, [(1, 2)] * 3)
+
+    def test_gives_up_after_max_attempts(self):
+        transport = FlakyTransport([sc2bnet.requests.Timeout("read timeout")] * 3)
+        factory = sc2bnet.SC2BnetFactory(transport=transport, retry=sc2bnet.RetryPolicy(max_attempts=2, backoff=0))
+        with self.assertRaises(sc2bnet.requests.Timeout):
+            factory.load_data('us.battle.net', '/api/sc2/ladder/150982')
+        self.assertEqual(len(transport.requests), 2)
+
+        transport = FlakyTransport([FakeResponse(500, None)] * 3)
+        factory = sc2bnet.SC2BnetFactory(transport=transport, retry=sc2bnet.RetryPolicy(max_attempts=2, backoff=0))
+        with self.assertRaises(sc2bnet.requests.HTTPError):
+            factory.load_data('us.battle.net', '/api/sc2/ladder/150982')
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_api_errors_are_not_retried(self):
+        transport = FakeTransport()
+        factory = sc2bnet.SC2BnetFactory(transport=transport, retry=sc2bnet.RetryPolicy(backoff=0))
+        with self.assertRaises(sc2bnet.SC2BnetError):
+            factory.load_profile('us', 23589, 1, 'Nobody')
+        self.assertEqual(len(transport.requests), 1)
+
+        # Even when sent with a retryable status, like authentication errors
+        transport = FlakyTransport([FakeResponse(500, dict(status='nok', code=500, message='Invalid Application'))] * 3)
+        factory = sc2bnet.SC2BnetFactory(transport=transport, retry=sc2bnet.RetryPolicy(backoff=1))
+        with self.assertRaises(sc2bnet.SC2BnetError):
+            factory.load_data('us.battle.net', '/api/sc2/ladder/150982')
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_backoff(self):
+        policy = sc2bnet.RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.delay(attempt) for attempt in range(1, 6)], [1, 2, 4, 5, 5])
+        self.assertEqual(policy.delay(1, FakeResponse(503, None, {'Retry-After': '3'})), 3)
+
+        policy = sc2bnet.RetryPolicy(backoff=1, max_backoff=5)
+        self.assertTrue(all(0 <= policy.delay(3) <= 4 for i in range(100)))
+
+
+@unittest.skipIf(asyncio is None, "asyncio is not available")
+class AsyncTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_load_profile_and_ladder(self):
+        bnet = sc2bnet.AsyncSC2BnetFactory(transport=FakeTransport())
+        profile, ladder = self.loop.run_until_complete(asyncio.gather(
+            bnet.load_profile('us', 100, 1, 'Alpha'),
+            bnet.load_ladder('us', 150982),
+        ))
+        self.assertEqual(profile.clan_tag, 'CLN')
+        self.assertEqual(profile.portrait.offset, 3)
+        self.assertEqual(ladder.rank[1].players[0].name, 'Bravo')
+
+        self.loop.run_until_complete(asyncio.gather(bnet.load_ladders(profile), bnet.load_matches(profile)))
+        self.assertEqual(profile.current_season.rankings[0].ladder.id, 150982)
+        self.assertEqual(profile.recent_matches[0].result, 'WIN')
+        bnet.close()
+
+    def test_pool_size(self):
+        bnet = sc2bnet.AsyncSC2BnetFactory(concurrency=50)
+        self.assertEqual(bnet.factory.transport.pool_size, 50)
+        bnet.close()
+
+        factory = sc2bnet.SC2BnetFactory()
+        bnet = sc2bnet.AsyncSC2BnetFactory(factory, concurrency=20)
+        self.assertEqual(factory.transport.pool_size, 20)
+        bnet.close()
+
+    def test_bounded_concurrency(self):
+        transport = SlowTransport()
+        bnet = sc2bnet.AsyncSC2BnetFactory(concurrency=4, transport=transport)
+        ladders = self.loop.run_until_complete(asyncio.gather(
+            *[bnet.load_ladder('us', i) for i in range(12)]
+        ))
+        self.assertEqual(len(ladders), 12)
+        self.assertEqual(transport.max_active, 4)
+        bnet.close()
+
+    def test_errors(self):
+        bnet = sc2bnet.AsyncSC2BnetFactory(transport=FakeTransport())
+        with self.assertRaises(sc2bnet.SC2BnetError):
+            self.loop.run_until_complete(bnet.load_profile('us', 23589, 1, 'Nobody'))
+        bnet.close()
+
 if __name__ == '__main__':
     unittest.main()